@@ -0,0 +1,370 @@
+import zlib
+from os import fsync, path, remove
+from struct import Struct, error as StructError
+from sys import stderr
+
+from config import Config
+from snapshot import GameSnapshot
+
+
+class AutosaveRing:
+    """Rolling autosaves, kept so that a game can be recovered after a crash
+
+    Autosaves are appended to a log as keyframes, which hold a whole
+    snapshot, and deltas, which only hold the parts of a snapshot that
+    differ from the keyframe before them.  Snapshots are compared section by
+    section, so a formation or list of lazers changing size only affects
+    its own section.  The log is split into two
+    segments which take turns: once the current segment holds the number of
+    autosaves to keep, the other one is started afresh with a keyframe, so
+    the last autosaves can always be read without rewriting old ones
+    """
+
+    # sequence number, sequence number of the keyframe, kind, length, crc32
+    RECORD = Struct("<IIBII")
+    KEYFRAME = 0
+    DELTA = 1
+    # number of sections in a keyframe or delta
+    SECTIONS = Struct("<H")
+    # length of a section, or of the delta of a section
+    SECTION = Struct("<I")
+    # length of the section a delta rebuilds
+    DELTA_HEADER = Struct("<I")
+    # number of bytes compared at a time when making a delta
+    BLOCK = 32
+
+    def __init__(self, game, filename=Config.AUTOSAVE_FILE,
+                 slots=Config.AUTOSAVE_SLOTS,
+                 keyframe_interval=Config.AUTOSAVE_KEYFRAME_INTERVAL) -> None:
+        """Initialise the autosave ring
+
+        :param game: The game to autosave
+        :param filename: The name to give the files of each segment
+        :param slots: The number of autosaves to keep
+        :param keyframe_interval: The number of autosaves between keyframes
+        :rtype: None
+        """
+        self.game = game
+        self.segments = [f"{filename}.0", f"{filename}.1"]
+        self.slots = slots
+        self.keyframe_interval = keyframe_interval
+
+        self.segment = 0
+        # number of autosaves in the current segment, or None if the next
+        # autosave should start a segment
+        self.count = None
+        self.sequence = 0
+        self.keyframe = None
+        self.keyframe_sequence = 0
+
+    def exists(self):
+        """Return whether there is an autosave to recover"""
+        return any(path.exists(segment) for segment in self.segments)
+
+    def save(self):
+        """Autosave the game
+
+        Only the snapshot is taken straight away, the delta is made and
+        written by the game's background writer
+        """
+        sections = GameSnapshot.save_sections(self.game)
+
+        start = self.count is None or self.count >= self.slots
+        if start:
+            if self.count is not None:
+                self.segment = 1 - self.segment
+            self.count = 0
+
+        if self.count % self.keyframe_interval == 0:
+            self.keyframe = sections
+            self.keyframe_sequence = self.sequence
+            item = (start, self.sequence, self.sequence, sections, None)
+        else:
+            item = (start, self.sequence, self.keyframe_sequence,
+                    sections, self.keyframe)
+
+        filename = self.segments[self.segment]
+        self.game.writer.append(
+            filename, item,
+            lambda items: AutosaveRing.write_records(filename, items))
+
+        self.count += 1
+        self.sequence += 1
+
+    def clear(self):
+        """Remove every autosave"""
+        for filename in self.segments:
+            self.game.writer.append(
+                filename, None,
+                lambda items, filename=filename:
+                    AutosaveRing.write_records(filename, items))
+        self.count = None
+        self.keyframe = None
+
+    @staticmethod
+    def write_records(filename, items):
+        """Append autosaves to a segment
+
+        :param filename: The segment to write to
+        :param items: The autosaves to write, as tuples of whether they start
+                      the segment, their sequence number, the sequence number
+                      of their keyframe, the sections of the snapshot and
+                      of the keyframe to make a delta against.  None removes the segment
+        """
+        records = []
+        mode = "ab"
+        for item in items:
+            if item is None or item[0]:
+                records = []
+                mode = "wb"
+            if item is not None:
+                records.append(AutosaveRing.encode_record(*item[1:]))
+
+        if not records:
+            if mode == "wb" and path.exists(filename):
+                remove(filename)
+            return
+
+        with open(filename, mode) as file:
+            file.write(b"".join(records))
+            file.flush()
+            fsync(file.fileno())
+
+    @staticmethod
+    def encode_record(sequence, keyframe_sequence, sections, keyframe):
+        """Pack an autosave into a record
+
+        :param sequence: The sequence number of the autosave
+        :param keyframe_sequence: The sequence number of its keyframe
+        :param sections: The sections of the snapshot to save
+        :param keyframe: The sections of the keyframe to make a delta
+                         against, or None to save the whole snapshot
+        """
+        if keyframe is None:
+            kind, payload = AutosaveRing.KEYFRAME, AutosaveRing.join_sections(
+                sections)
+        else:
+            kind, payload = AutosaveRing.DELTA, AutosaveRing.make_delta(
+                keyframe, sections)
+
+        payload = zlib.compress(payload, 1)
+        return AutosaveRing.RECORD.pack(
+            sequence, keyframe_sequence, kind, len(payload),
+            zlib.crc32(payload)) + payload
+
+    @staticmethod
+    def join_sections(sections):
+        """Pack the sections of a snapshot, prefixed by their lengths
+
+        :param sections: The sections to pack
+        """
+        return AutosaveRing.SECTIONS.pack(len(sections)) \
+            + b"".join(AutosaveRing.SECTION.pack(len(section))
+                       for section in sections) \
+            + b"".join(sections)
+
+    @staticmethod
+    def split_sections(data):
+        """Unpack sections packed by join_sections
+
+        :param data: The packed sections
+        """
+        count, = AutosaveRing.SECTIONS.unpack_from(data)
+        offset = AutosaveRing.SECTIONS.size
+        lengths = Struct(f"<{count}I").unpack_from(data, offset)
+        offset += AutosaveRing.SECTION.size * count
+
+        sections = []
+        for length in lengths:
+            sections.append(data[offset:offset + length])
+            offset += length
+        if offset != len(data):
+            raise ValueError("sections do not match their lengths")
+        return sections
+
+    @staticmethod
+    def make_delta(keyframe, sections):
+        """Return the parts of a snapshot which differ from a keyframe
+
+        Each section is compared with the same section of the keyframe, so
+        a section which grows or shrinks does not move the others
+
+        :param keyframe: The sections of the snapshot to compare against
+        :param sections: The sections of the snapshot to encode
+        :returns: The number of sections, then the length and delta of each
+        """
+        parts = [AutosaveRing.SECTIONS.pack(len(sections))]
+        for i, section in enumerate(sections):
+            base = keyframe[i] if i < len(keyframe) else b""
+            delta = AutosaveRing.make_section_delta(base, section)
+            parts.append(AutosaveRing.SECTION.pack(len(delta)))
+            parts.append(delta)
+        return b"".join(parts)
+
+    @staticmethod
+    def apply_delta(keyframe, delta):
+        """Rebuild the sections of a snapshot from a keyframe and a delta
+
+        :param keyframe: The sections of the snapshot the delta was made
+                         against
+        :param delta: A delta returned by make_delta
+        """
+        count, = AutosaveRing.SECTIONS.unpack_from(delta)
+        offset = AutosaveRing.SECTIONS.size
+
+        sections = []
+        for i in range(count):
+            length, = AutosaveRing.SECTION.unpack_from(delta, offset)
+            offset += AutosaveRing.SECTION.size
+            base = keyframe[i] if i < len(keyframe) else b""
+            sections.append(AutosaveRing.apply_section_delta(
+                base, delta[offset:offset + length]))
+            offset += length
+        return sections
+
+    @staticmethod
+    def make_section_delta(keyframe, section):
+        """Return the blocks of a section which differ from a keyframe
+
+        :param keyframe: The section of the keyframe to compare against
+        :param section: The section to encode
+        :returns: The section's length, a bitmap with a bit set for each
+                  block that differs, then the blocks which differ
+        """
+        block = AutosaveRing.BLOCK
+        blocks = (len(section) + block - 1) // block
+        bitmap = bytearray((blocks + 7) // 8)
+        changed = []
+
+        for i in range(blocks):
+            start = i * block
+            data = section[start:start + block]
+            if data != keyframe[start:start + block]:
+                bitmap[i // 8] |= 1 << (i % 8)
+                changed.append(data)
+
+        return AutosaveRing.DELTA_HEADER.pack(len(section)) \
+            + bytes(bitmap) + b"".join(changed)
+
+    @staticmethod
+    def apply_section_delta(keyframe, delta):
+        """Rebuild a section from a keyframe and a delta
+
+        :param keyframe: The section of the keyframe the delta was made
+                         against
+        :param delta: A delta returned by make_section_delta
+        """
+        block = AutosaveRing.BLOCK
+        length, = AutosaveRing.DELTA_HEADER.unpack_from(delta)
+        blocks = (length + block - 1) // block
+        offset = AutosaveRing.DELTA_HEADER.size
+        bitmap = delta[offset:offset + (blocks + 7) // 8]
+        offset += len(bitmap)
+
+        parts = []
+        for i in range(blocks):
+            start = i * block
+            size = min(block, length - start)
+            if bitmap[i // 8] & (1 << (i % 8)):
+                parts.append(delta[offset:offset + size])
+                offset += size
+            else:
+                parts.append(keyframe[start:start + size])
+        return b"".join(parts)
+
+    @staticmethod
+    def read_records(filename):
+        """Read the records of a segment
+
+        Reading stops at the first record which is incomplete or damaged,
+        such as one that was being written when the power was lost
+
+        :param filename: The segment to read
+        :returns: A list of (sequence, keyframe sequence, kind, payload)
+        """
+        if not path.exists(filename):
+            return []
+        with open(filename, "rb") as file:
+            data = file.read()
+
+        records = []
+        offset = 0
+        while offset < len(data):
+            try:
+                sequence, keyframe_sequence, kind, length, crc = \
+                    AutosaveRing.RECORD.unpack_from(data, offset)
+            except StructError:
+                break
+            offset += AutosaveRing.RECORD.size
+            payload = data[offset:offset + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                break
+            offset += length
+            records.append((sequence, keyframe_sequence, kind, payload))
+        return records
+
+    def load_latest(self):
+        """Find the newest autosave which can be rebuilt
+
+        :returns: The sequence number, segment and snapshot of the autosave,
+                  or None if there is none
+        """
+        self.game.writer.flush()
+
+        records = []
+        for segment, filename in enumerate(self.segments):
+            try:
+                records += [record + (segment,) for record
+                            in AutosaveRing.read_records(filename)]
+            except OSError as error:
+                print(f"Failed to read {filename}: {error}", file=stderr)
+
+        keyframes = {
+            sequence: payload
+            for sequence, _, kind, payload, _ in records
+            if kind == AutosaveRing.KEYFRAME
+        }
+
+        for sequence, keyframe_sequence, kind, payload, segment in sorted(
+                records, reverse=True):
+            try:
+                data = zlib.decompress(payload)
+                if kind == AutosaveRing.DELTA:
+                    if keyframe_sequence not in keyframes:
+                        continue
+                    sections = AutosaveRing.apply_delta(
+                        AutosaveRing.split_sections(zlib.decompress(
+                            keyframes[keyframe_sequence])),
+                        data)
+                else:
+                    sections = AutosaveRing.split_sections(data)
+            except (zlib.error, StructError, ValueError):
+                continue
+            return (sequence, segment, b"".join(sections))
+        return None
+
+    def restore(self):
+        """Restore the game from the newest autosave
+
+        :returns: True if the game was restored, otherwise every autosave
+                  is removed
+        """
+        latest = self.load_latest()
+        if latest is not None:
+            sequence, segment, snapshot = latest
+            try:
+                GameSnapshot.load(self.game, snapshot)
+            except ValueError as error:
+                print(f"Failed to load autosave: {error}", file=stderr)
+            else:
+                # carry on in the other segment, so the autosave which was
+                # restored is kept until there are newer ones
+                self.sequence = sequence + 1
+                self.segment = segment
+                self.count = self.slots
+                self.keyframe = None
+                return True
+
+        # start again, so nothing newer is left to be recovered by mistake
+        self.clear()
+        return False
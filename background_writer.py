@@ -0,0 +1,128 @@
+from os import fsync, path, remove, replace
+from sys import stderr
+from threading import Condition, Thread
+
+
+class BackgroundWriter:
+    """Thread which writes files so that the game loop does not wait on disk
+
+    Requests are coalesced while they wait: only the latest contents of a
+    file are written, and items appended under the same key are passed to
+    their writer together as one batch
+    """
+
+    def __init__(self) -> None:
+        """Initialise the writer and start its thread
+
+        :rtype: None
+        """
+        self.condition = Condition()
+
+        # latest contents waiting to be written to each file, None to remove
+        self.replacements = {}
+        # items waiting to be written for each key, with their write function
+        self.batches = {}
+        # keys of the files and batches currently being written
+        self.writing = set()
+
+        self.running = True
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def write_atomic(filename, data):
+        """Replace a file's contents so that it is never left half written
+
+        :param filename: The file to write
+        :param data: The new contents, or None to remove the file
+        """
+        if data is None:
+            if path.exists(filename):
+                remove(filename)
+            return
+
+        temp_filename = f"{filename}.tmp"
+        with open(temp_filename, "wb") as file:
+            file.write(data)
+            file.flush()
+            fsync(file.fileno())
+        replace(temp_filename, filename)
+
+    def replace_file(self, filename, data):
+        """Queue new contents for a file, replacing any that are waiting
+
+        :param filename: The file to write
+        :param data: The new contents, or None to remove the file
+        """
+        with self.condition:
+            self.replacements[filename] = data
+            self.condition.notify_all()
+
+    def append(self, key, item, write):
+        """Queue an item to be written along with others under the same key
+
+        :param key: Identifies the batch, such as a filename
+        :param item: The item to add to the batch
+        :param write: Function which writes a list of items
+        """
+        with self.condition:
+            if key in self.batches:
+                self.batches[key][1].append(item)
+            else:
+                self.batches[key] = (write, [item])
+            self.condition.notify_all()
+
+    def is_pending(self, key):
+        """Return whether anything is waiting to be written for a key
+
+        :param key: The filename or batch key to check
+        """
+        with self.condition:
+            return key in self.replacements or key in self.batches \
+                or key in self.writing
+
+    def run(self):
+        """Write queued requests until the writer is closed"""
+        while True:
+            with self.condition:
+                while self.running and not self.replacements \
+                        and not self.batches:
+                    self.condition.wait()
+                if not self.replacements and not self.batches:
+                    return
+
+                replacements, self.replacements = self.replacements, {}
+                batches, self.batches = self.batches, {}
+                self.writing = set(replacements) | set(batches)
+
+            try:
+                for filename, data in replacements.items():
+                    try:
+                        BackgroundWriter.write_atomic(filename, data)
+                    except Exception as error:
+                        print(f"Failed to write {filename}: {error}",
+                              file=stderr)
+
+                for key, (write, items) in batches.items():
+                    try:
+                        write(items)
+                    except Exception as error:
+                        print(f"Failed to write {key}: {error}", file=stderr)
+            finally:
+                # always let flush return, even if the thread is stopping
+                with self.condition:
+                    self.writing = set()
+                    self.condition.notify_all()
+
+    def flush(self):
+        """Wait until everything that has been queued is written"""
+        with self.condition:
+            while self.replacements or self.batches or self.writing:
+                self.condition.wait()
+
+    def close(self):
+        """Write everything that is queued and stop the thread"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join()
@@ -43,12 +43,21 @@ class CircleBossFormation(EnemyFormation):
         )
         self.circle_formation = CircleFormation(
             game, self.minion_image_name, attributes)
+        # the ring changes shape every frame, so it can't be precomputed
+        self.circle_formation.tabulated = False
 
         super().__init__(game, self.image_name, attributes)
 
+        # the minions circle around the boss, wherever it is
+        self.circle_formation.node.set_parent(self.node)
+
     def create_enemies(self):
-        """Spawn the boss"""
+        """Spawn the boss and its minions"""
         self.spawn_enemy((-4, -4, 0))
+        yield
+
+        while not self.circle_formation.build_step():
+            yield
 
     def tick(self, player):
         """Update the boss's position
@@ -57,8 +66,6 @@ class CircleBossFormation(EnemyFormation):
         :type player: Player
         """
         super().tick(player)
-        self.circle_formation.x = self.x
-        self.circle_formation.y = self.y
         a = (self.alpha/CircleBossFormation.CYCLE_PEROID)*2*math.pi - math.pi
 
         r = 50*math.sin(a) - 25
@@ -102,14 +109,18 @@ class SnakeBossFormation(EnemyFormation):
     """Enemy formation for the snake boss"""
 
     LENGTH = 32
+    # number of frames that each segment lags behind the one before it
+    SEGMENT_DELAY = 4
 
-    def __init__(self, game: Game, attributes: FormationAttributes):
+    def __init__(self, game: Game, attributes: FormationAttributes,
+                 length=LENGTH):
         """Initialise the snake boss
 
         :param game: The game which the boss belongs to
         :type game: Game
         :param attributes: The attributes of which to base spawned enemies on
         :type attributes: FormationAttributes
+        :param length: The number of segments between the head and the tail
         """
         self.minion_name = "smallenemy1"
         self.tail_name = "smallenemy1_evil"
@@ -117,6 +128,12 @@ class SnakeBossFormation(EnemyFormation):
 
         self.phase = 1
         self.phase_timer = 0
+        self.length = length
+
+        # ring buffer of the head's recent path, indexed by alpha
+        self.history_size = (length+1)*SnakeBossFormation.SEGMENT_DELAY + 1
+        self.history = [(0, 0)] * self.history_size
+        self.history_alpha = None
 
         super().__init__(game, self.minion_name, attributes)
 
@@ -128,17 +145,20 @@ class SnakeBossFormation(EnemyFormation):
                                    (0, 0, 0), head_attributes)
 
         self.sprites.append(self.head)
+        yield
 
-        for i in range(SnakeBossFormation.LENGTH):
+        for i in range(self.length):
             self.spawn_enemy((0, 0, i+1))
+            yield
 
         tail_attributes = replace(self.attributes)
         head_attributes.hp //= 5
         self.tail = FormationEnemy(self.game, self.tail_name,
-                                   (0, 0, SnakeBossFormation.LENGTH+1),
+                                   (0, 0, self.length+1),
                                    tail_attributes)
 
         self.sprites.append(self.tail)
+        yield
 
     def spawn_enemy(self, offset):
         """Spawn one enemy unit of the snake
@@ -155,19 +175,17 @@ class SnakeBossFormation(EnemyFormation):
         self.sprites.append(enemy)
         return enemy
 
-    def position_enemy(self, enemy: FormationEnemy):
-        """Position the enemy on the game screen
+    def head_offset(self, alpha):
+        """Calculate the position of the head relative to the formation
 
-        :param enemy: The enemy to position
-        :type enemy: FormationEnemy
+        :param alpha: The frame at which to calculate the position
         """
         if self.phase == 2:
             p = 120 / (100 + math.cos(self.phase_timer / 400)*20) * 120
         else:
             p = 120
 
-        m = 4
-        t = ((-enemy.offset_a*m) + self.game.alpha) / p + math.pi
+        t = alpha / p + math.pi
         a = self.game.w // 2
         b = self.game.h // 3
         c = 0
@@ -177,10 +195,41 @@ class SnakeBossFormation(EnemyFormation):
         else:
             n = 5
 
-        enemy.set_pos((
-            int(self.x + a*math.sin(n*t+c)),
-            int(self.y + b*math.sin(t))
-        ))
+        return (a*math.sin(n*t+c), b*math.sin(t))
+
+    def record_head(self):
+        """Write the head's current position into the history"""
+        alpha = self.game.alpha
+        size = self.history_size
+
+        if self.history_alpha == alpha - 1:
+            self.history[alpha % size] = self.head_offset(alpha)
+        else:
+            # frames were missed, so rebuild the whole history
+            for i in range(alpha - size + 1, alpha + 1):
+                self.history[i % size] = self.head_offset(i)
+
+        self.history_alpha = alpha
+
+    def calculate_positions(self, offsets):
+        """Calculate the positions of every segment of the snake
+
+        Each segment follows the path that the head took a few frames ago
+
+        :param offsets: The offsets of the segments to position
+        """
+        alpha = self.game.alpha
+        if self.history_alpha != alpha:
+            self.record_head()
+
+        size = self.history_size
+        delay = SnakeBossFormation.SEGMENT_DELAY
+
+        positions = []
+        for _, _, offset_a in offsets:
+            x, y = self.history[(alpha - offset_a*delay) % size]
+            positions.append((int(self.x + x), int(self.y + y)))
+        return positions
 
     def tick(self, player):
         """Update the position of the enemies
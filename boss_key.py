@@ -6,6 +6,9 @@ class BossKey():
     """Object which manages the 'boss key' feature
        When a key is pressed, then the screen switches to a "work"
        related image
+
+       The image is built once as a hidden group of canvas items, and the
+       game loop is suspended for as long as it is shown
     """
 
     FG = "#ffaa00"
@@ -13,6 +16,8 @@ class BossKey():
     BG2 = "#ffffff"
     FG2 = "#555555"
     TEXT_SIZE = 30
+    # canvas tag shared by every shape of the image
+    TAG = "bosskey"
 
     def __init__(self, game: Game, pause_callback) -> None:
         """Initialises the boss key feature
@@ -30,6 +35,8 @@ class BossKey():
         self.hidden = True
         self.pause_callback = pause_callback
 
+        self.create_shapes()
+
     def on_key(self, event):
         """Handle key press events
 
@@ -38,13 +45,11 @@ class BossKey():
         if event.keysym == self.game.inputs.settings.boss \
                 and self.hidden:
             self.pause_callback()
-            self.create_shapes()
-            self.hidden = False
+            self.show()
             return True
 
         if not self.hidden:
-            self.delete_shapes()
-            self.hidden = True
+            self.hide()
             return True
 
         return False
@@ -59,7 +64,7 @@ class BossKey():
         :param color: The colour of the rectangle
         """
         self.shapes.append(self.canvas.create_rectangle(
-            x, y, x+w, y+h, fill=color, state="disabled"))
+            x, y, x+w, y+h, fill=color, state="hidden", tags=BossKey.TAG))
 
     def write_text(self, x, y, text):
         """Create a text object
@@ -70,10 +75,11 @@ class BossKey():
         """
         self.shapes.append(self.canvas.create_text(
             x, y, text=text, fill=BossKey.BG2,
-            font=(f"Helvetica {BossKey.TEXT_SIZE} bold"), state="disabled"))
+            font=(f"Helvetica {BossKey.TEXT_SIZE} bold"), state="hidden",
+            tags=BossKey.TAG))
 
     def create_shapes(self):
-        """Create all the shapes needed for the calculator"""
+        """Create all the shapes needed for the calculator, hidden"""
         width = self.width
         height = self.height
         padding = width // 50
@@ -121,7 +127,15 @@ class BossKey():
                 symbol = symbols[col + row*num_cols]
                 self.write_text(offset_x, offset_y, symbol)
 
-    def delete_shapes(self):
-        """Remove all the shapes used for the calculator"""
-        for shape in self.shapes:
-            self.canvas.delete(shape)
+    def show(self):
+        """Show the calculator over everything else and suspend the game"""
+        self.canvas.itemconfig(BossKey.TAG, state="disabled")
+        self.canvas.tag_raise(BossKey.TAG)
+        self.hidden = False
+        self.game.suspend()
+
+    def hide(self):
+        """Hide the calculator and carry on running the game"""
+        self.canvas.itemconfig(BossKey.TAG, state="hidden")
+        self.hidden = True
+        self.game.resume()
@@ -1,3 +1,5 @@
+from collections import deque
+from sys import stderr
 from typing import Callable, List
 
 from config import Config
@@ -19,23 +21,6 @@ class Cheat:
         self.game = game
         self.code = code
         self.callback = callback
-        self.position = 0
-
-    def on_key(self, event):
-        """Handle a key press event
-
-        :param event: The event that is being handled
-        """
-        if self.position < len(self.code):
-            next_key = self.code[self.position]
-            if event.keysym == next_key:
-                self.position += 1
-                if self.position == len(self.code):
-                    self.callback()
-                    self.position = 0
-            else:
-                self.position = 0
-        return False
 
 
 class InvincibilityCheat(Cheat):
@@ -73,6 +58,7 @@ class DevModeCheat(Cheat):
        - enables spawning menu
        - key to remove all enemies
        - key to stop spawning outright
+       - key to print performance statistics
     """
 
     def __init__(self, game, code: List[str]):
@@ -84,6 +70,7 @@ class DevModeCheat(Cheat):
         """
         super().__init__(game, code, self.toggle)
         self.enabled = Config.DEVMODE
+        self.game.inputs.add_keypress_handler(self.on_key)
 
         self.spawning_disabled = False
         self.spawn_menu = Menu(self.game, "Spawn Menu")
@@ -139,11 +126,21 @@ class DevModeCheat(Cheat):
             if event.keysym == "m":
                 self.spawn_menu.show()
 
-        return super().on_key(event)
+            if event.keysym == "i":
+                print(self.game.frame_counter.report(), file=stderr)
+                print(self.game.frame_counter.usage_report(), file=stderr)
+                print(self.game.trajectory_cache.report(), file=stderr)
+
+        return False
 
 
 class CheatEngine:
-    """Object which manages cheats"""
+    """Object which manages cheats
+
+    All cheat codes are compiled into a single Aho-Corasick automaton, so
+    each key press is one transition however many cheats there are, and codes
+    which overlap with a partly typed code are still recognised
+    """
 
     def __init__(self, game):
         """Initialise the cheat engine
@@ -153,10 +150,73 @@ class CheatEngine:
         self.game = game
         self.cheats = []
 
+        # trie of every code, as the key transitions out of each node
+        self.trie = [{}]
+        # cheats whose code ends at each node of the trie
+        self.endings = [[]]
+
+        # automaton built from the trie, rebuilt after a cheat is added
+        self.transitions = [{}]
+        self.matches = [[]]
+        self.compiled = True
+        self.state = 0
+
+        self.game.inputs.add_keypress_handler(self.on_key)
+
     def add_cheat(self, cheat):
         """Register a cheat to the engine
 
         :param cheat: The cheat to be registered
         """
-        self.game.inputs.add_keypress_handler(cheat.on_key)
+        node = 0
+        for key in cheat.code:
+            if key not in self.trie[node]:
+                self.trie[node][key] = len(self.trie)
+                self.trie.append({})
+                self.endings.append([])
+            node = self.trie[node][key]
+
+        self.endings[node].append(cheat)
         self.cheats.append(cheat)
+        self.compiled = False
+
+    def compile(self):
+        """Build the automaton from the trie of codes
+
+        Each node gets a transition for every key which continues a code,
+        following the longest suffix of the keys typed so far which is also
+        the start of a code.  Keys with no transition go back to the root
+        """
+        self.transitions = [dict(edges) for edges in self.trie]
+        self.matches = [list(cheats) for cheats in self.endings]
+        fail = [0] * len(self.trie)
+
+        queue = deque(self.trie[0].values())
+        while queue:
+            node = queue.popleft()
+            self.matches[node].extend(self.matches[fail[node]])
+
+            for key, child in self.trie[node].items():
+                if node != 0:
+                    fail[child] = self.transitions[fail[node]].get(key, 0)
+                queue.append(child)
+
+            for key, target in self.transitions[fail[node]].items():
+                self.transitions[node].setdefault(key, target)
+
+        self.state = 0
+        self.compiled = True
+
+    def on_key(self, event):
+        """Advance the automaton, activating any cheats that were completed
+
+        :param event: The key press event to handle
+        """
+        if not self.compiled:
+            self.compile()
+
+        self.state = self.transitions[self.state].get(event.keysym, 0)
+        for cheat in self.matches[self.state]:
+            cheat.callback()
+
+        return False
@@ -11,10 +11,29 @@ class Config:
     SCALE = 6
 
     FPS = 30
+    # Frame rate of menus and other states where little is moving
+    IDLE_FPS = 10
+    # Time that the 95th percentile of frames should be updated within
+    FRAME_BUDGET = 1 / FPS
+
+    # Number of precomputed formation paths to keep in memory
+    TRAJECTORY_CACHE_SIZE = 64
+    # Number of canvas items reserved for particles such as explosions
+    PARTICLE_POOL_SIZE = 96
 
     NICK_LEN = 3
     DEVMODE = False
 
     LEADERBOARD_FILE = "leaderboard"
+    # Address of a leaderboard service to use instead of the file, either
+    # the path of a unix socket or a (host, port) pair, or None for the file
+    LEADERBOARD_SERVER = None
     SAVE_FILE = "save"
+    # Autosaves are kept in two segment files named after this
+    AUTOSAVE_FILE = "autosave"
+    # Number of frames of game play between autosaves
+    AUTOSAVE_INTERVAL = FPS
+    # Number of autosaves to keep, and how often one holds a whole snapshot
+    AUTOSAVE_SLOTS = 30
+    AUTOSAVE_KEYFRAME_INTERVAL = 10
     SETTINGS_FILE = "settings"
@@ -30,19 +30,22 @@ class Enemy(Shooter):
         super().__init__(game, image_name, attributes)
         self.attributes = attributes
 
-    def tick(self, player):
+    def tick(self, player, lazers=None):
         """Check for collisions and shoot
 
         :param player: The player which to check collisions with
+        :param lazers: The player's lazers which could hit this enemy,
+                       defaults to all of them
         """
         super().tick()
-        if self.attributes.cooldown != -1:
-            self.shoot()
 
-        lazer_collisions = self.collide_all(player.lazers)
+        if lazers is None:
+            lazers = player.lazers
+
+        lazer_collisions = self.collide_all(lazers)
         if lazer_collisions != -1:
             self.damage()
-            player.lazers[lazer_collisions].destroy()
+            lazers[lazer_collisions].destroy()
 
         player_collisions = player.collide_all(self.lazers)
         if player_collisions != -1:
@@ -53,6 +56,12 @@ class Enemy(Shooter):
             player.damage()
             self.damage()
 
+    def on_reloaded(self):
+        """Shoot as soon as the cooldown is over"""
+        super().on_reloaded()
+        if not self.hidden:
+            self.shoot()
+
     def damage(self, amount=1):
         """Reduce the object's health
 
@@ -326,17 +326,20 @@ class Font:
         ]
 
     @staticmethod
-    def load_text(texture_factory, text, color="#fff", letter_space=1):
+    def load_text(texture_factory, text, color="#fff", letter_space=1,
+                  cache=True):
         """Create and load text into a photo image
 
         :param texture_factory: The texture factory used for processing
         :param text: The text to convert
         :param color: Color of the text
         :param letter_space: Spacing between letters
+        :param cache: Whether to keep the image for later use
         """
         return texture_factory.load_texture(f"text:{text}",
                                             Font._create_font_texture(
                                                 text,
                                                 color=color,
-                                                letter_space=letter_space)
+                                                letter_space=letter_space),
+                                            cache=cache
                                             )
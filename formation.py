@@ -1,12 +1,39 @@
 from dataclasses import dataclass
+from itertools import count
 import math
 from typing import List
 
+from config import Config
 from enemy import Enemy, EnemyAttributes
 from game import Game
+from scene import SceneNode
 from sprite import Sprite
 
 
+def circle_path(t, radius):
+    """A ring, starting at the bottom and turning clockwise
+
+    :param t: The fraction of the period that has elapsed
+    :param radius: The radius of the ring
+    """
+    angle = -t * 2*math.pi
+    return (math.sin(angle) * radius, math.cos(angle) * radius)
+
+
+def lemniscate_path(t, radius):
+    """An 'infinity' shaped curve
+
+    :param t: The fraction of the period that has elapsed
+    :param radius: The half-width of the curve
+    """
+    angle = -t * 2*math.pi
+    sin_t, cos_t = math.sin(angle), math.cos(angle)
+    return (
+        (radius * cos_t) / (1 + sin_t**2),
+        (radius * sin_t * cos_t) / (1 + sin_t**2)
+    )
+
+
 @dataclass
 class FormationAttributes(EnemyAttributes):
     """FormationAttributes."""
@@ -29,12 +56,41 @@ class FormationEnemy(Enemy):
         :type attributes: EnemyAttributes
         """
         self.offset_x, self.offset_y, self.offset_a = offset
+
+        # the rigid formation that this enemy is attached to, if any
+        self.formation = None
+        self._x, self._y = 0, 0
+
         super().__init__(game, image_name, attributes)
 
+    @property
+    def x(self):
+        """The x position, derived from the formation if it is rigid"""
+        if self.formation is not None:
+            return self.formation.origin_x + self.offset_x
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        self._x = value
+
+    @property
+    def y(self):
+        """The y position, derived from the formation if it is rigid"""
+        if self.formation is not None:
+            return self.formation.origin_y + self.offset_y
+        return self._y
+
+    @y.setter
+    def y(self, value):
+        self._y = value
+
 
 class EnemyFormation:
     """Cluster of enemies that move in a particular way"""
 
+    ids = count()
+
     def __init__(self, game: Game, image_name: str,
                  enemy_attributes: FormationAttributes):
         """Initialise the formation
@@ -53,15 +109,230 @@ class EnemyFormation:
         self.alpha = 0
         self.attributes = enemy_attributes
 
-        self.x, self.y = 0, 0
+        self.node = SceneNode()
         self.destroyed = False
 
-        self.create_enemies()
+        # sine and cosine of each enemy's phase offset, keyed by the scale
+        # used to turn an offset into radians
+        self.phase_vectors = {}
+
+        # whether the path of this formation can be read from a
+        # precomputed trajectory table
+        self.tabulated = True
+
+        # a formation that only positions its enemies by their fixed offsets
+        # is rigid, so all of its enemies can be moved as one canvas group
+        self.rigid = type(self).calculate_positions \
+            is EnemyFormation.calculate_positions
+        self.tag = f"formation{next(EnemyFormation.ids)}"
+        self.origin_x, self.origin_y = 0, 0
+        self.drawn_x, self.drawn_y = 0, 0
+
+        # box containing every enemy, as (left, top, right, bottom)
+        self.bounds = None
+        self.extent = None
+        self.extent_count = 0
+        self.culled = False
+
+        # enemies are spawned by build, which can be spread over many frames
+        self.builder = self.create_enemies()
         self.hidden = True
 
+    @property
+    def x(self):
+        """The absolute x position of this formation"""
+        return self.node.get_world_position()[0]
+
+    @property
+    def y(self):
+        """The absolute y position of this formation"""
+        return self.node.get_world_position()[1]
+
     def create_enemies(self):
-        """Spawn enemies"""
-        pass
+        """Spawn enemies, yielding after each one"""
+        yield from ()
+
+    def build_step(self, steps=1):
+        """Spawn some of the enemies of a formation that is being built
+
+        :param steps: The maximum number of enemies to spawn
+        :returns: True if the formation has been completely built
+        """
+        if self.builder is not None:
+            try:
+                for _ in range(steps):
+                    next(self.builder)
+            except StopIteration:
+                self.builder = None
+        return self.builder is None
+
+    def build(self):
+        """Spawn all of the enemies that have not been spawned yet"""
+        if self.builder is not None:
+            for _ in self.builder:
+                pass
+            self.builder = None
+
+    def get_offsets(self):
+        """Return the offsets of all the enemies in this formation"""
+        return [
+            (enemy.offset_x, enemy.offset_y, enemy.offset_a)
+            for enemy in self.sprites
+        ]
+
+    def get_phase_vectors(self, offsets, scale):
+        """Return the sine and cosine of each offset's phase angle
+
+        The angles only depend on the offsets, so they are only calculated
+        once for each scale
+
+        :param offsets: The offsets of the enemies
+        :param scale: Multiplier to convert an offset_a into radians
+        """
+        if scale not in self.phase_vectors:
+            if len(self.phase_vectors) > 4:
+                self.phase_vectors.clear()
+            self.phase_vectors[scale] = {}
+        vectors = self.phase_vectors[scale]
+
+        result = []
+        for _, _, offset_a in offsets:
+            vector = vectors.get(offset_a)
+            if vector is None:
+                angle = offset_a * scale
+                vector = (math.sin(angle), math.cos(angle))
+                vectors[offset_a] = vector
+            result.append(vector)
+        return result
+
+    def lookup_positions(self, offsets, path, params, phase_scale=1):
+        """Read the positions of enemies from a precomputed trajectory table
+
+        :param offsets: The offsets of the enemies to position
+        :param path: The path function that the enemies follow
+        :param params: The parameters of the path
+        :param phase_scale: Multiplier to convert an offset_a into frames
+        """
+        period = self.attributes.period
+        table = self.game.trajectory_cache.get_table(path, params, period)
+        alpha = self.game.alpha
+
+        positions = []
+        for _, _, offset_a in offsets:
+            x, y = table[(round(offset_a * phase_scale) + alpha) % period]
+            positions.append((int(self.x + x), int(self.y + y)))
+        return positions
+
+    def calculate_positions(self, offsets):
+        """Calculate the positions of a list of enemies in one pass
+
+        :param offsets: The offsets of the enemies to position
+        :returns: A list containing an (x, y) position for each offset
+        """
+        return [
+            (int(self.x + offset_x), int(self.y + offset_y))
+            for offset_x, offset_y, _ in offsets
+        ]
+
+    def position_enemies(self):
+        """Position all the enemies in this formation
+
+        Nothing is redrawn while the whole formation is off screen
+        """
+        if self.rigid:
+            # the enemies only need to move if the formation has moved
+            if self.node.consume_change() \
+                    or self.extent_count != len(self.sprites):
+                self.origin_x, self.origin_y = int(self.x), int(self.y)
+                self.update_bounds()
+                if self.is_on_screen():
+                    self.move_group()
+        else:
+            positions = self.calculate_positions(self.get_offsets())
+            self.update_bounds(positions)
+            if self.is_on_screen():
+                Sprite.set_positions(self.sprites, positions,
+                                     redraw=self.culled)
+                self.culled = False
+            else:
+                for enemy, (x, y) in zip(self.sprites, positions):
+                    enemy.x, enemy.y = x, y
+                self.culled = True
+
+    def move_group(self):
+        """Move all enemies of a rigid formation with one canvas operation"""
+        dx = self.origin_x - self.drawn_x
+        dy = self.origin_y - self.drawn_y
+        if dx != 0 or dy != 0:
+            self.drawn_x, self.drawn_y = self.origin_x, self.origin_y
+            self.game.canvas.move(
+                self.tag, dx * Config.SCALE, dy * Config.SCALE)
+
+    def update_extent(self):
+        """Recalculate the size of the enemies after the formation changed
+
+        For a rigid formation this is the box around all the offsets,
+        otherwise it is the size of the largest enemy
+        """
+        self.extent_count = len(self.sprites)
+        if self.rigid:
+            self.extent = (
+                min(e.offset_x for e in self.sprites),
+                min(e.offset_y for e in self.sprites),
+                max(e.offset_x + e.w for e in self.sprites),
+                max(e.offset_y + e.h for e in self.sprites),
+            )
+        else:
+            self.extent = (
+                max(e.w for e in self.sprites),
+                max(e.h for e in self.sprites)
+            )
+
+    def update_bounds(self, positions=None):
+        """Recalculate the box which contains every enemy
+
+        :param positions: The new positions of the enemies, if the
+                          formation is not rigid
+        """
+        if self.extent_count != len(self.sprites):
+            self.update_extent()
+
+        if self.rigid:
+            left, top, right, bottom = self.extent
+            self.bounds = (
+                self.origin_x + left,
+                self.origin_y + top,
+                self.origin_x + right,
+                self.origin_y + bottom
+            )
+        else:
+            w, h = self.extent
+            self.bounds = (
+                min(x for x, _ in positions),
+                min(y for _, y in positions),
+                max(x for x, _ in positions) + w,
+                max(y for _, y in positions) + h
+            )
+
+    def overlaps(self, sprite):
+        """Check if a sprite is within the bounds of this formation
+
+        :param sprite: The sprite to check
+        """
+        if self.bounds is None:
+            return True
+
+        left, top, right, bottom = self.bounds
+        return sprite.x < right \
+            and sprite.x + sprite.w > left \
+            and sprite.y < bottom \
+            and sprite.y + sprite.h > top
+
+    def is_on_screen(self):
+        """Return True if any part of the formation is within the screen"""
+        left, top, right, bottom = self.bounds
+        return right > 0 and left < self.game.w \
+            and bottom > 0 and top < self.game.h
 
     def position_enemy(self, enemy: FormationEnemy):
         """Position a single enemy
@@ -69,12 +340,8 @@ class EnemyFormation:
         :param enemy: The enemy to position
         :type enemy: FormationEnemy
         """
-        enemy.set_pos(
-            (
-                int(self.x + enemy.offset_x),
-                int(self.y + enemy.offset_y)
-            )
-        )
+        offset = (enemy.offset_x, enemy.offset_y, enemy.offset_a)
+        enemy.set_pos(self.calculate_positions([offset])[0])
 
     def spawn_enemy(self, offset):
         """Spawn a single enemy
@@ -84,39 +351,60 @@ class EnemyFormation:
         enemy = FormationEnemy(self.game, self.image_name,
                                offset, self.attributes)
         self.sprites.append(enemy)
+        if self.rigid:
+            self.attach_enemy(enemy)
         return enemy
 
+    def attach_enemy(self, enemy: FormationEnemy):
+        """Add an enemy to the canvas group of a rigid formation
+
+        :param enemy: The enemy to attach
+        :type enemy: FormationEnemy
+        """
+        enemy.formation = self
+        self.game.canvas.addtag_withtag(self.tag, enemy.canvas_image)
+        enemy.update_position()
+
     def tick(self, player):
         """Update the positions of all enemies
 
         :param player: The player to check if the enemies collide with
         """
+        self.build()
         self.alpha += 1
+
+        # only lazers within the formation can hit any of its enemies
+        lazers = [lazer for lazer in player.lazers if self.overlaps(lazer)]
         for enemy in self.sprites:
-            enemy.tick(player)
-            self.position_enemy(enemy)
+            enemy.tick(player, lazers)
         self.sprites = Sprite.remove_destroyed(self.sprites)
         if len(self.sprites) == 0:
             self.destroy()
+        else:
+            self.position_enemies()
 
     def destroy(self):
         """Delete all enemies in this formation"""
         for enemy in self.sprites:
             enemy.destroy()
         self.sprites = []
+        self.builder = None
         self.destroyed = True
 
     def set_pos(self, pos):
-        """Set the position of this formation
+        """Set the position of this formation relative to its parent
 
         :param pos: position to move to
         """
-        self.x, self.y = pos
+        self.node.set_position(pos)
 
     def show(self):
         """Make this formation visible"""
+        self.build()
         if self.hidden:
             for enemy in self.sprites:
+                # enemies may have been built long before they appear
+                enemy.reload()
                 enemy.show()
             self.hidden = False
 
@@ -156,27 +444,32 @@ class CircleFormation(EnemyFormation):
         """Spawn all the enemies"""
         for i in range(self.attributes.count):
             self.spawn_enemy((0, 0, i))
+            yield
 
-    def position_enemy(self, enemy: FormationEnemy):
-        """Position a single enemy
+    def calculate_positions(self, offsets):
+        """Calculate the positions of enemies around the ring
 
-        :param enemy:
-        :type enemy: FormationEnemy
+        :param offsets: The offsets of the enemies to position
         """
-        a = (enemy.offset_a / self.attributes.count) * \
-            self.attributes.period + self.game.alpha
-        enemy.set_pos(
+        radius = self.attributes.radius
+        if self.tabulated:
+            return self.lookup_positions(
+                offsets, circle_path, (radius,),
+                phase_scale=self.attributes.period / self.attributes.count)
+
+        base = (-self.game.alpha / self.attributes.period) * 2*math.pi
+        sin_base, cos_base = math.sin(base), math.cos(base)
+
+        # rotate each enemy's place in the ring by the current angle
+        vectors = self.get_phase_vectors(
+            offsets, -2*math.pi / self.attributes.count)
+        return [
             (
-                int(
-                    self.x+math.sin((-a/self.attributes.period)
-                                    * 2*math.pi) * self.attributes.radius
-                ),
-                int(
-                    self.y+math.cos((-a/self.attributes.period)
-                                    * 2*math.pi) * self.attributes.radius
-                )
+                int(self.x + (sin_base*cos_a + cos_base*sin_a) * radius),
+                int(self.y + (cos_base*cos_a - sin_base*sin_a) * radius)
             )
-        )
+            for sin_a, cos_a in vectors
+        ]
 
 
 class LemniscateFormation(EnemyFormation):
@@ -200,27 +493,15 @@ class LemniscateFormation(EnemyFormation):
         for i in range(self.attributes.count):
             self.spawn_enemy((0, 0, (i / self.attributes.count)
                              * self.attributes.period * 0.25))
+            yield
 
-    def position_enemy(self, enemy: FormationEnemy):
-        """Position an enemy
+    def calculate_positions(self, offsets):
+        """Calculate the positions of enemies along the curve
 
-        :param enemy:
-        :type enemy: FormationEnemy
+        :param offsets: The offsets of the enemies to position
         """
-        a = enemy.offset_a + self.game.alpha
-
-        t = (-a/self.attributes.period)*2*math.pi
-        x = self.x+(self.attributes.radius * math.cos(t)) / \
-            (1 + math.sin(t)**2)
-        y = self.y+(self.attributes.radius * math.sin(t) * math.cos(t)) / \
-            (1 + math.sin(t)**2)
-
-        enemy.set_pos(
-            (
-                int(x),
-                int(y)
-            )
-        )
+        return self.lookup_positions(
+            offsets, lemniscate_path, (self.attributes.radius,))
 
 
 @dataclass
@@ -257,6 +538,7 @@ class TriangleFormation(EnemyFormation):
             x = 2*((i % 2)-0.5) * ((i+1)//2)*self.attributes.spacing
 
             self.spawn_enemy((x, y, 1))
+            yield
 
 
 @dataclass
@@ -294,3 +576,4 @@ class RectangleFormation(EnemyFormation):
             for x in range(self.attributes.width):
                 offset_x = ((x+0.5)*self.attributes.spacing)-(full_width/2)
                 self.spawn_enemy((offset_x, offset_y, 1))
+                yield
@@ -16,12 +16,45 @@ from formation import (
 )
 
 
+# number of frames for one side to side movement of the wobble pattern,
+# roughly 80*2*pi
+WOBBLE_PERIOD = 503
+
+FIGURE_OF_EIGHT_PERIOD = 600
+
+
+def wobble_path(t, width):
+    """Horizontal sway used by the wobble pattern
+
+    :param t: The fraction of the period that has elapsed
+    :param width: The width of the area to sway across
+    """
+    return ((1+math.sin(t * 2*math.pi)) * width/2, 0)
+
+
+def figure_of_eight_path(t, radius, cx, cy):
+    """A figure of eight centered around a point
+
+    :param t: The fraction of the period that has elapsed
+    :param radius: The half-height of the figure
+    :param cx: x coordinate of the center
+    :param cy: y coordinate of the center
+    """
+    t = t*2*math.pi - math.pi/2
+    return (
+        cx + (radius * math.sin(t) * math.cos(t)) / (1 + math.sin(t)**2),
+        cy + (radius * math.cos(t)) / (1 + math.sin(t)**2)
+    )
+
+
 def wobble_pattern(formation):
     """A sinusoidal movement pattern
 
     :param formation: Formation to move
     """
-    x = (1+math.sin(formation.alpha/80)) * formation.game.w/2
+    table = formation.game.trajectory_cache.get_table(
+        wobble_path, (formation.game.w,), WOBBLE_PERIOD)
+    x, _ = table[formation.alpha % WOBBLE_PERIOD]
     y = formation.y + (1 if formation.alpha % 4 == 0 else 0)
     formation.set_pos((x, y))
 
@@ -79,7 +112,7 @@ def figure_of_eight_pattern(formation):
 
     :param formation: Formation to move
     """
-    period = 600
+    period = FIGURE_OF_EIGHT_PERIOD
     edge = 8
     radius = formation.game.h//3 - edge
     cx, cy = formation.game.w//2, formation.game.h//3
@@ -88,11 +121,9 @@ def figure_of_eight_pattern(formation):
         x = formation.x
         y = (formation.alpha/200) * (cy*1.5) - (cy*0.5)
     else:
-        a = formation.alpha - 200
-        t = (a/period)*2*math.pi - math.pi/2
-
-        y = cy + (radius * math.cos(t)) / (1 + math.sin(t)**2)
-        x = cx + (radius * math.sin(t) * math.cos(t)) / (1 + math.sin(t)**2)
+        table = formation.game.trajectory_cache.get_table(
+            figure_of_eight_path, (radius, cx, cy), period)
+        x, y = table[(formation.alpha - 200) % period]
 
     formation.set_pos((int(x), int(y)))
 
@@ -100,6 +131,9 @@ def figure_of_eight_pattern(formation):
 class FormationSpawner():
     """Object to manage spawning of enemies and phases"""
 
+    # number of enemies of the next formation to build during each idle frame
+    PREPARE_STEPS = 2
+
     def __init__(self, game):
         """Initialise the formation spawner
 
@@ -114,18 +148,28 @@ class FormationSpawner():
         self.phase = -1
         self.phases = [
             Phase("Phase:1", [
-                  self.spawn_fleet,
-                  self.spawn_loop,
-                  self.spawn_orbital], 10),
-            Phase("Boss:1", [self.spawn_circle_boss], 1),
+                  self.create_fleet,
+                  self.create_loop,
+                  self.create_orbital], 10),
+            Phase("Boss:1", [self.create_circle_boss], 1),
             Phase("Phase:2", [
-                  self.spawn_fleet,
-                  self.spawn_loop,
-                  self.spawn_orbital], 10, max_wave=3),
-            Phase("Boss:2", [self.spawn_snake_boss], 1),
+                  self.create_fleet,
+                  self.create_loop,
+                  self.create_orbital], 10, max_wave=3),
+            Phase("Boss:2", [self.create_snake_boss], 1),
         ]
 
+        # phases are generated when first needed and then kept
+        self.schedule = self.generate_phases()
+        self.scheduled_phases = []
+
+        # the next formation to be spawned, built in advance while idle
+        self.prepared = None
+
         self.to_spawn = 0
+        self.wave = 0
+        # number of formations fewer than usual that may be on screen at once
+        self.throttle = 0
         self.current_reward = 1
 
     def tick(self):
@@ -140,15 +184,46 @@ class FormationSpawner():
 
         self.spawn_next()
 
+    def get_random_options(self):
+        """Return the functions that a random formation is created from"""
+        return [
+            self.create_fleet,
+            self.create_loop,
+            self.create_orbital,
+            self.create_rectangle
+        ]
+
+    def create_random(self):
+        """Create a random formation"""
+        return choice(self.get_random_options())()
+
     def spawn_random(self):
         """Spawn a random formation"""
-        options = [
-            self.spawn_fleet,
-            self.spawn_loop,
-            self.spawn_orbital,
-            self.spawn_rectangle
-        ]
-        choice(options)()
+        self.spawn_formation(*self.create_random())
+
+    def spawn_circle_boss(self):
+        """Spawn the circle boss"""
+        self.spawn_formation(*self.create_circle_boss())
+
+    def spawn_snake_boss(self):
+        """Spawn the snake boss"""
+        self.spawn_formation(*self.create_snake_boss())
+
+    def spawn_fleet(self):
+        """Spawn the fleet formation"""
+        self.spawn_formation(*self.create_fleet())
+
+    def spawn_orbital(self):
+        """Spawn the orbital formation"""
+        self.spawn_formation(*self.create_orbital())
+
+    def spawn_rectangle(self):
+        """Spawn the rectangle formation"""
+        self.spawn_formation(*self.create_rectangle())
+
+    def spawn_loop(self):
+        """Spawn the loop formation"""
+        self.spawn_formation(*self.create_loop())
 
     def spawn_formation(self, formation: EnemyFormation, update):
         """Add a formation to the list of formations
@@ -157,12 +232,13 @@ class FormationSpawner():
         :type formation: EnemyFormation
         :param update: movement function to use for this formation
         """
+        formation.build()
         update(formation)
         formation.show()
         self.formations.append((formation, update))
 
-    def spawn_circle_boss(self):
-        """Spawn the circle boss"""
+    def create_circle_boss(self):
+        """Create the circle boss"""
         attributes = EnemyAttributes(
             hp=int(15*self.difficulty_multiplier),
             reward=self.current_reward,
@@ -171,10 +247,10 @@ class FormationSpawner():
         formation = CircleBossFormation(self.game, attributes)
         formation.set_pos((self.game.w//2, 0))
         update = figure_of_eight_pattern
-        self.spawn_formation(formation, update)
+        return formation, update
 
-    def spawn_snake_boss(self):
-        """Spawn the snake boss"""
+    def create_snake_boss(self):
+        """Create the snake boss"""
         attributes = FormationAttributes(
             hp=int(10*self.difficulty_multiplier),
             reward=self.current_reward,
@@ -184,10 +260,10 @@ class FormationSpawner():
         formation = SnakeBossFormation(self.game, attributes)
         formation.set_pos((self.game.w//2, 0))
         update = slide_in_pattern
-        self.spawn_formation(formation, update)
+        return formation, update
 
-    def spawn_fleet(self):
-        """Spawn the fleet formation"""
+    def create_fleet(self):
+        """Create the fleet formation"""
         sprite = randint(6, 7)
 
         position = (random()*self.game.w, -32)
@@ -203,10 +279,10 @@ class FormationSpawner():
         formation.set_pos(position)
 
         update = speed_pattern
-        self.spawn_formation(formation, update)
+        return formation, update
 
-    def spawn_orbital(self):
-        """Spawn the orbital formation"""
+    def create_orbital(self):
+        """Create the orbital formation"""
         position = (random()*self.game.w, -32)
         sprite = choice((1, 3))
 
@@ -226,10 +302,10 @@ class FormationSpawner():
 
         update = wobble_pattern
         formation.alpha = randint(1, 1000)
-        self.spawn_formation(formation, update)
+        return formation, update
 
-    def spawn_rectangle(self):
-        """Spawn the rectangle formation"""
+    def create_rectangle(self):
+        """Create the rectangle formation"""
         sprite = choice((0, 2))
         position = (random() * self.game.w, -32)
 
@@ -248,10 +324,10 @@ class FormationSpawner():
 
         update = wobble_pattern
         formation.alpha = randint(1, 1000)
-        self.spawn_formation(formation, update)
+        return formation, update
 
-    def spawn_loop(self):
-        """Spawn the loop formation"""
+    def create_loop(self):
+        """Create the loop formation"""
         sprite = choice((4, 5))
         position = (random()*self.game.w, -32)
         attributes = CircleFormationAttributes(
@@ -268,56 +344,115 @@ class FormationSpawner():
         formation.set_pos(position)
 
         update = slow_pattern
-        self.spawn_formation(formation, update)
+        return formation, update
 
     def spawn_next(self):
         """Spawn the next formation to be spawned"""
         if self.to_spawn > 0:
-            if len(self.formations) < self.current_phase().max_wave:
-                if self.game.alpha > self.next_formation \
-                        and self.next_formation != -1:
-                    self.next_formation = self.game.alpha \
-                            + 100 / self.difficulty_multiplier
-
-                    self.current_phase().get_spawn_function()()
-                    self.to_spawn -= 1
+            max_wave = max(1, self.current_phase().max_wave - self.throttle)
+            if len(self.formations) < max_wave \
+                    and self.game.alpha > self.next_formation \
+                    and self.next_formation != -1:
+                self.next_formation = self.game.alpha \
+                    + 100 / self.difficulty_multiplier
+
+                if self.prepared is None:
+                    self.prepare_next()
+                self.spawn_formation(*self.prepared)
+                self.prepared = None
+                self.to_spawn -= 1
+                self.wave += 1
+            else:
+                self.prepare_next()
         else:
             if len(self.formations) == 0:
                 self.next_phase()
 
+    def prepare_next(self):
+        """Build part of the next formation while waiting to spawn it"""
+        if self.prepared is None:
+            spawn_function = self.current_phase().get_spawn_function(self.wave)
+            self.prepared = spawn_function()
+        else:
+            formation, _ = self.prepared
+            formation.build_step(FormationSpawner.PREPARE_STEPS)
+
     def next_phase(self):
         """Increment the phase by 1 and start the next phase"""
         self.phase += 1
-        self.game.save_game()
         self.start_phase()
+        # saved once the phase has started, so it resumes from its beginning
+        self.game.save_game()
 
     def start_phase(self):
         """Start the next phase"""
-        self.to_spawn = self.current_phase().duration
-
-        self.difficulty_multiplier = (self.phase+2) * 0.5
+        # a game which has not reached its first phase, such as after a
+        # save failed to load, starts from the beginning
+        self.phase = max(self.phase, 0)
+        phase = self.current_phase()
+        self.to_spawn = phase.duration
+        self.wave = 0
+
+        self.difficulty_multiplier = FormationSpawner.get_difficulty(
+            self.phase)
         self.current_reward = int(2**self.difficulty_multiplier)
 
         self.next_formation = self.game.alpha + 100
-        if self.current_phase().name:
-            self.game.effect_player.splash_text(self.current_phase().name)
+        phase.plan_waves(self.next_formation,
+                         100 / self.difficulty_multiplier)
+
+        if phase.name:
+            self.game.effect_player.splash_text(phase.name)
+
+    @staticmethod
+    def get_difficulty(phase):
+        """Return the difficulty multiplier used during a phase
+
+        :param phase: The index of the phase
+        """
+        return (phase+2) * 0.5
+
+    def generate_phases(self):
+        """Generate every phase of the game in order, endlessly"""
+        yield from self.phases
+
+        index = len(self.phases)
+        while True:
+            yield Phase(
+                f"Phase:{index-1}", self.get_random_options(),
+                # endless phases last as long as 10 formations at the
+                # difficulty of the phase before them
+                10 * FormationSpawner.get_difficulty(index-1),
+                max_wave=int(FormationSpawner.get_difficulty(index))
+            )
+            index += 1
+
+    def get_phase(self, index):
+        """Return a phase, generating the schedule up to it if needed
+
+        :param index: The index of the phase
+        :raises IndexError: If the index is negative, as no phase has started
+        """
+        if index < 0:
+            raise IndexError(f"phase {index} has not started")
+        while len(self.scheduled_phases) <= index:
+            self.scheduled_phases.append(next(self.schedule))
+        return self.scheduled_phases[index]
 
     def current_phase(self):
         """Return the current phase"""
-        if self.phase < len(self.phases):
-            return self.phases[self.phase]
-
-        return Phase(f"Phase:{self.phase-1}", [
-            self.spawn_random
-        ], 10 * self.difficulty_multiplier,
-            max_wave=int(self.difficulty_multiplier)
-                     )
+        return self.get_phase(self.phase)
 
     def clear_all(self):
         """Remove all formation objects"""
         for f, _ in self.formations:
             f.destroy()
 
+        if self.prepared is not None:
+            formation, _ = self.prepared
+            formation.destroy()
+            self.prepared = None
+
 
 class Phase:
     """Rules for which formation will be spawned"""
@@ -326,7 +461,8 @@ class Phase:
         """__init__.
 
         :param name: The name of the phase
-        :param spawn_functions:  A list of functions to use to spawn enemies
+        :param spawn_functions:  A list of functions which create a formation
+                                 and return it with its movement function
         :param duration: The number of formations to spawn
                          before the phase is over
         :param max_wave: The maximum number of formations to spawn at a time
@@ -336,6 +472,28 @@ class Phase:
         self.name = name
         self.max_wave = max_wave
 
-    def get_spawn_function(self):
-        """Return a random spawn function"""
+        # (earliest frame, spawn function) of each wave in the phase
+        self.waves = []
+
+    def plan_waves(self, start, delay):
+        """Decide which formation will be spawned in each wave
+
+        :param start: The earliest frame at which the first wave can spawn
+        :param delay: The minimum number of frames between waves
+        :returns: A list of (earliest frame, spawn function) for each wave
+        """
+        self.waves = [
+            (int(start + i*delay), choice(self.spawn_functions))
+            for i in range(math.ceil(self.duration))
+        ]
+        return self.waves
+
+    def get_spawn_function(self, wave=-1):
+        """Return the spawn function planned for a wave
+
+        :param wave: The index of the wave, a random spawn function is
+                     returned if it has not been planned
+        """
+        if 0 <= wave < len(self.waves):
+            return self.waves[wave][1]
         return choice(self.spawn_functions)
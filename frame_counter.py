@@ -1,41 +1,219 @@
+from collections import deque
 from sys import stderr
-from time import time
+from time import perf_counter, process_time
 
 
 class FrameCounter:
     """Creates a main loop and ensures that the framerate is static"""
 
-    def __init__(self, canvas, target_fps):
+    # number of recent frames to keep timing metrics for
+    WINDOW = 120
+
+    def __init__(self, canvas, target_fps, rates=None):
         """Initialise the frame counter
 
         :param canvas: The canvas which to call after on
         :param target_fps: The fps to aim to achieve
+        :param rates: The fps to run at in particular states, other states
+                      run at the target fps
         """
         self.canvas = canvas
         self.fps = target_fps
         self.frame_time = 1 / target_fps
-        self.last_frame = time()
+        self.last_frame = perf_counter()
+        self.frame_start = self.last_frame
+        # seconds between the starts of the last two frames
+        self.elapsed = self.frame_time
+        # fraction of a frame at the target fps which is still to be moved
+        # on by, carried between frames at a reduced rate
+        self.owed = 0.0
+
+        self.rates = rates if rates is not None else {}
+        # state of the game during the current or next frame
+        self.state = None
+        # the scheduled frame, so that it can be brought forward
+        self.pending = None
+
+        # number of frames, seconds of cpu time and seconds of wall time
+        # spent in each state
+        self.usage = {}
+        self.last_cpu = process_time()
 
         self.current_fps = 1
 
-    def next_frame(self, callback):
+        # seconds spent updating the game in each recent frame
+        self.work_times = deque(maxlen=FrameCounter.WINDOW)
+        # seconds between the starts of recent frames
+        self.frame_times = deque(maxlen=FrameCounter.WINDOW)
+        # seconds from a key press to the end of the frame that showed it
+        self.input_latencies = deque(maxlen=FrameCounter.WINDOW)
+        # arrival times of key presses that were responded to this frame
+        self.input_times = []
+
+        # whether frames should stop being scheduled, and whether they have
+        self.suspended = False
+        self.stopped = False
+
+    def start_frame(self):
+        """Mark the start of the work done in a frame"""
+        t = perf_counter()
+        self.elapsed = t - self.frame_start
+        self.frame_start = t
+        # the scheduled frame is the one which is now running
+        self.pending = None
+
+    def get_rate(self):
+        """Return the fps to run at in the current state"""
+        return self.rates.get(self.state, self.fps)
+
+    def get_step(self, state=None):
+        """Return the number of frames at the target fps that the current
+        frame stands for
+
+        Frames at the target fps always stand for one.  Frames at a reduced
+        rate stand for the time since the last frame, so frames brought
+        forward by key presses do not speed anything up
+
+        :param state: The state of the game the frame is run in
+        """
+        rate = self.rates.get(state, self.fps)
+        if rate >= self.fps:
+            self.owed = 0.0
+            return 1
+
+        # frames which come late, such as after being stopped, are not
+        # caught up on
+        owed = self.owed + self.elapsed * self.fps
+        step = min(int(owed), round(self.fps / rate))
+        self.owed = (owed - step) % 1
+        return step
+
+    def add_input_times(self, times):
+        """Time key presses which are responded to in the current frame
+
+        :param times: The times at which the key presses arrived
+        """
+        self.input_times.extend(times)
+
+    def next_frame(self, callback, state=None):
         """Calculate when the next frame should be called
 
         :param callback: function to call for the next frame
+        :param state: The state of the game for the next frame, which
+                      decides the rate it is run at
         """
-        t = time()
+        t = perf_counter()
         ft = t - self.last_frame
+        work = t - self.frame_start
+        cpu = process_time()
+
+        self.work_times.append(work)
+        # frames at a reduced rate would hide the timings of full rate ones
+        if self.frame_time == 1 / self.fps:
+            self.frame_times.append(ft)
+        for time in self.input_times:
+            self.input_latencies.append(t - time)
+        self.input_times = []
+
+        usage = self.usage.setdefault(self.state, [0, 0, 0])
+        usage[0] += 1
+        usage[1] += cpu - self.last_cpu
+        usage[2] += ft
+        self.last_cpu = cpu
+        self.state = state
+
+        if self.suspended:
+            self.stopped = True
+            self.pending = None
+            self.last_frame = t
+            return
 
         delay = 0
 
+        # this frame was scheduled at the rate of the previous state
         if ft > self.frame_time:
             if ft - self.frame_time > self.frame_time / 5:
                 print(
                     f"Help! Running {ft - self.frame_time} seconds behind!",
                     file=stderr)
-        else:
-            delay = self.frame_time - ft
 
-        self.canvas.after(int(delay*1000), callback)
-        self.current_fps = 1 / (delay+ft)
+        # only wait for what is left of the frame after its work, since the
+        # time since the last frame already includes the last wait
+        self.frame_time = 1 / self.get_rate()
+        if work < self.frame_time:
+            delay = self.frame_time - work
+
+        self.pending = self.canvas.after(int(delay*1000), callback)
+        self.current_fps = 1 / (delay+work)
         self.last_frame = t
+
+    def wake(self, callback):
+        """Schedule a frame straight away if frames have been stopped, or
+        are running at a reduced rate
+
+        The time spent stopped is not counted towards the next frame
+
+        :param callback: function to call for the next frame
+        """
+        if self.stopped:
+            self.stopped = False
+            self.last_frame = perf_counter()
+            self.pending = self.canvas.after(0, callback)
+        elif self.pending is not None and self.get_rate() < self.fps:
+            # bring the next frame forward, so a key press in a state with
+            # a reduced rate is handled straight away
+            self.canvas.after_cancel(self.pending)
+            self.pending = self.canvas.after(0, callback)
+
+    @staticmethod
+    def percentile(samples, p):
+        """Return a percentile of a collection of samples
+
+        :param samples: The samples to use
+        :param p: The percentile to find, between 0 and 100
+        """
+        if not samples:
+            return 0
+        ordered = sorted(samples)
+        return ordered[int((len(ordered) - 1) * p / 100)]
+
+    def work_time_percentile(self, p):
+        """Return a percentile of the recent time spent updating the game
+
+        :param p: The percentile to find, between 0 and 100
+        """
+        return FrameCounter.percentile(self.work_times, p)
+
+    def frame_time_percentile(self, p):
+        """Return a percentile of the recent time between frames
+
+        :param p: The percentile to find, between 0 and 100
+        """
+        return FrameCounter.percentile(self.frame_times, p)
+
+    def input_latency_percentile(self, p):
+        """Return a percentile of the recent latency of key presses
+
+        :param p: The percentile to find, between 0 and 100
+        """
+        return FrameCounter.percentile(self.input_latencies, p)
+
+    def report(self):
+        """Return a summary of the recent frame timings"""
+        return (f"frames: {self.current_fps:.1f} fps, "
+                f"work p50 {self.work_time_percentile(50)*1000:.1f}ms "
+                f"p95 {self.work_time_percentile(95)*1000:.1f}ms, "
+                f"frame p95 {self.frame_time_percentile(95)*1000:.1f}ms, "
+                f"input p50 {self.input_latency_percentile(50)*1000:.1f}ms "
+                f"p95 {self.input_latency_percentile(95)*1000:.1f}ms")
+
+    def usage_report(self):
+        """Return the cpu usage and wakeups per second in each state"""
+        lines = []
+        for state, (frames, cpu, wall) in self.usage.items():
+            name = getattr(state, "name", str(state))
+            wall = max(wall, 1e-9)
+            lines.append(f"{name}: {self.rates.get(state, self.fps)} fps "
+                         f"target, {frames / wall:.1f} wakeups/s, "
+                         f"cpu {cpu / wall * 100:.1f}%")
+        return "\n".join(lines)
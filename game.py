@@ -1,13 +1,17 @@
 from random import randint, random
 from tkinter import Canvas, PhotoImage, Tk
-from typing import List
 
+from background_writer import BackgroundWriter
 from config import Config
 from font import Font
 from frame_counter import FrameCounter
 from inputs import InputController
+from particles import ParticleSystem
 from sprite import Sprite
+from starfield import Starfield
 from textures import TextureFactory
+from timer_wheel import TimerWheel
+from trajectory import TrajectoryCache
 
 
 class Game:
@@ -27,33 +31,74 @@ class Game:
                              height=game_height, bg="#000")
         self.canvas.pack()
 
+        self.writer = BackgroundWriter()
         self.texture_factory = TextureFactory(scale=Config.SCALE)
+        self.trajectory_cache = TrajectoryCache(Config.TRAJECTORY_CACHE_SIZE)
         self.effect_player = EffectPlayer(self)
         self.frame_counter = FrameCounter(self.canvas, Config.FPS)
 
+        # current state of the game, used to route key events
+        self.state = None
         self.inputs = InputController(self)
         self.sprites = []
 
         self.score = 0
 
         self.alpha = 0
+        # number of frames drawn, which keeps counting while paused
+        self.frame = 0
+
+        # timers keyed by alpha, for things that stop while the game is paused
+        self.timers = TimerWheel(self.alpha)
+        # timers keyed by frame, for the user interface
+        self.ui_timers = TimerWheel(self.frame)
 
     def start(self):
         """Start the game"""
         self.loop()
         self.win.mainloop()
+        self.close()
+
+    def close(self):
+        """Finish writing anything that still needs saving"""
+        self.writer.close()
 
     def tick(self):
         """Update the game's sprites"""
+        self.timers.advance(self.alpha)
         for sprite in self.sprites:
             sprite.tick()
         self.effect_player.tick()
 
     def loop(self):
         """Loop the game at a set framerate"""
-        self.alpha += 1
+        self.frame_counter.start_frame()
+        self.inputs.process_events()
+        # states with a reduced frame rate move on several frames at a time,
+        # decided by the state the key presses have left the game in
+        step = self.frame_counter.get_step(self.state)
+        self.alpha += step
+        self.frame += step
+        self.ui_timers.advance(self.frame)
         self.tick()
-        self.frame_counter.next_frame(self.loop)
+        self.frame_counter.add_input_times(self.inputs.take_response_times())
+        self.frame_counter.next_frame(self.loop, self.state)
+
+    def suspend(self):
+        """Stop running frames until resume is called
+
+        A key press still runs a single frame, so that it can be handled
+        """
+        self.frame_counter.suspended = True
+
+    def resume(self):
+        """Carry on running frames after suspend"""
+        self.frame_counter.suspended = False
+        self.frame_counter.wake(self.loop)
+
+    def wake(self):
+        """Run a frame if frames have been suspended"""
+        self.frame_counter.wake(self.loop)
 
     def clear_all(self):
         """Remove all game sprites"""
@@ -118,48 +163,20 @@ class GameEffect(GameSprite):
         self.velocity_x, self.velocity_y = momentum
         super().__init__(game, image)
 
-    def tick(self):
-        """Move the effect by its momentum and remove it if its over"""
-        super().tick()
-        self.move(self.velocity_x, self.velocity_y)
-
-        alpha = self.game.alpha - self.start_time
-        if self.duration != -1 and alpha > self.duration:
-            self.destroy()
-
-
-class AnimatedEffect(GameEffect):
-    """An effect which involves animating an image"""
-
-    def __init__(self, game: Game, images: List[PhotoImage],
-                 frame_time=1, momentum=(0, 0)):
-        """Initialise the effect
-
-        :param game: The game which this belongs to
-        :type game: Game
-        :param images: The images to use for this animation
-        :type images: List[PhotoImage]
-        :param frame_time: Length of each frame of the animation
-        :param momentum: Direction to move this effect
-        """
-        self.start_time = game.alpha
-        self.frame_time = frame_time
-        self.images = images
-        self.frame_start = game.alpha
-        super().__init__(game, images[0], duration=len(
-            images)*frame_time, momentum=momentum)
+        self.lifetime = None
+        if duration != -1:
+            self.lifetime = game.timers.schedule(duration + 1, self.destroy)
 
     def tick(self):
-        """Animate the effect"""
+        """Move the effect by its momentum"""
         super().tick()
+        self.move(self.velocity_x, self.velocity_y)
 
-        alpha = self.game.alpha - self.start_time
-
-        i = int(alpha // self.frame_time)
-        if i < len(self.images):
-            self.set_image(self.images[i])
-        else:
-            self.destroy()
+    def destroy(self):
+        """Remove the effect"""
+        super().destroy()
+        if self.lifetime is not None:
+            self.lifetime.cancel()
 
 
 class EffectPlayer:
@@ -174,7 +191,12 @@ class EffectPlayer:
         self.sprites = []
         self.game = game
         self.explosion_frames = []
+        self.explosions = None
         self.star_image: PhotoImage
+        self.starfield = None
+
+        # fraction of cosmetic effects to create, lowered when frames are slow
+        self.detail = 1.0
 
     def load_textures(self):
         """Load effect textures"""
@@ -183,61 +205,35 @@ class EffectPlayer:
             self.game.texture_factory.get_image(f"explosion{i+1}")
             for i in range(3)
         ]
+        self.explosions = ParticleSystem(
+            self.game, self.explosion_frames, frame_time=5)
         self.star_image = self.game.texture_factory.get_image("star")
 
     def tick(self):
         """Update all effects"""
+        if self.starfield is not None:
+            self.starfield.tick()
+        if self.explosions is not None:
+            self.explosions.tick()
+
         for sprite in self.sprites:
-            sprite.tick()
+            if not sprite.destroyed:
+                sprite.tick()
 
         self.sprites = Sprite.remove_destroyed(self.sprites)
 
     def create_stars(self):
         """Initialise the stars in the background"""
-        for _ in range(100):
-            self.create_star(True)
-
-    def create_star(self, new=False):
-        """Add a star to the background
-
-        :param new: Whether this star should be added at
-                    the top of the screen or anywhere
-        """
-        x = randint(0, self.game.w)
-        if new:
-            y = randint(0, self.game.h)
-        else:
-            y = -1
-
-        speed = randint(1, 4) * 0.1
-        duration = 2*self.game.h / speed
-
-        star = GameEffect(
-            self.game,
-            self.star_image,
-            duration=int(duration),
-            momentum=(0, speed)
-        )
-        star.set_pos((x, y))
-
-        star.send_to_back()
-        star.show()
-
-        self.sprites.append(star)
+        self.starfield = Starfield(self.game, self.star_image)
 
     def create_explosion(self, position=(0, 0)):
         """Create an explosion effect
 
         :param position: location of the explosion
         """
-        for _ in range(randint(1, 3)):
+        for _ in range(max(1, round(randint(1, 3) * self.detail))):
             m = ((random()*2)-1, (random()*2)-1)
-            explosion_sprite = AnimatedEffect(
-                self.game, self.explosion_frames, frame_time=5, momentum=m)
-            explosion_sprite.set_pos(position)
-            explosion_sprite.show()
-
-            self.sprites.append(explosion_sprite)
+            self.explosions.emit(position, m)
 
     def splash_text(self, text, duration=50):
         """splash_text.
@@ -270,6 +266,7 @@ class DamageableSprite(GameSprite):
         :type image_name: str
         :param hp: The number of hit points this sprite spawns with
         """
+        self.image_name = image_name
         self.image = game.texture_factory.get_image(image_name)
         self.white_image = game.texture_factory.get_image(
             f"{image_name}:white")
@@ -1,6 +1,8 @@
+from collections import deque
 from dataclasses import dataclass
 from os import path
 from sys import stderr
+from time import perf_counter
 
 from config import Config
 
@@ -39,7 +41,16 @@ class InputSettings:
 
 
 class InputController:
-    """Object which listens to key inputs"""
+    """Object which listens to key inputs
+
+    Key events are queued as they arrive, and applied at the start of the
+    next frame so that every part of a frame sees the same inputs
+    """
+
+    # flags which move or fire the player, used to measure input latency
+    TIMED_FLAGS = {"k_down", "k_left", "k_up", "k_right", "k_action"}
+    # seconds after which a key press that had no effect stops being timed
+    LATENCY_TIMEOUT = 0.5
 
     def __init__(self, game) -> None:
         """Initialise the input controller
@@ -47,14 +58,28 @@ class InputController:
         :param game: The game which this belongs to
         :rtype: None
         """
+        self.game = game
         game.win.bind('<KeyPress>', self.on_key_press)
         game.win.bind('<KeyRelease>', self.on_key_release)
 
-        self.handlers = []
+        # handlers for each game state, in order of registration
+        # handlers registered for every state are kept under None
+        self.press_handlers = {}
+        self.release_handlers = {}
+
+        # key events waiting to be processed, with the time they arrived
+        self.events = deque()
+        # arrival times of key presses that the player has not responded to
+        self.press_times = []
+        self.responded = False
 
         self.settings = InputSettings()
         self.settings.load_inputs()
 
+        # names of the flags set by each key
+        self.bindings = {}
+        self.bind_keys()
+
         self.k_down = False
         self.k_left = False
         self.k_up = False
@@ -63,71 +88,115 @@ class InputController:
         self.k_pause = False
         self.k_boss = False
 
-    def on_key_press(self, e):
-        """Handle Key press events
+    def bind_keys(self):
+        """Rebuild the key lookup table from the current settings"""
+        self.bindings = {}
+        for name, key in vars(self.settings).items():
+            self.bindings.setdefault(key, []).append(f"k_{name}")
 
-        :param e: The key press event to handle
+    def set_flags(self, keysym, value):
+        """Set the flags bound to a key
+
+        :param keysym: The key that was pressed or released
+        :param value: The value to set the flags to
+        :returns: The names of the flags that were set
         """
-        if e.keysym == self.settings.left:
-            self.k_left = True
+        flags = self.bindings.get(keysym, ())
+        for flag in flags:
+            setattr(self, flag, value)
+        return flags
 
-        if e.keysym == self.settings.right:
-            self.k_right = True
+    def dispatch(self, handlers, e):
+        """Pass an event to the handlers for the current state
 
-        if e.keysym == self.settings.up:
-            self.k_up = True
+        Handlers registered most recently are called first, and handlers for
+        every state are called before those for the current state
 
-        if e.keysym == self.settings.down:
-            self.k_down = True
+        :param handlers: Lists of handlers for each state
+        :param e: The event to handle
+        """
+        states = [None]
+        if self.game.state is not None:
+            states.append(self.game.state)
 
-        if e.keysym == self.settings.action:
-            self.k_action = True
+        for state in states:
+            for handler in reversed(handlers.get(state, ())):
+                if handler(e):
+                    return
 
-        if e.keysym == self.settings.pause:
-            self.k_pause = True
+    def on_key_press(self, e):
+        """Queue Key press events, waking the game if it is suspended
 
-        for t, h in self.handlers:
-            if t == "press" and h(e):
-                break
+        :param e: The key press event to handle
+        """
+        self.events.append((perf_counter(), True, e))
+        self.game.wake()
 
     def on_key_release(self, e):
-        """Handle Key release events
+        """Queue Key release events
 
 
         :param e: The key press event to handle
         """
-        if e.keysym == self.settings.left:
-            self.k_left = False
+        self.events.append((perf_counter(), False, e))
 
-        if e.keysym == self.settings.right:
-            self.k_right = False
+    def process_events(self):
+        """Apply every key event that arrived since the last frame"""
+        while self.events:
+            time, pressed, e = self.events.popleft()
+            flags = self.set_flags(e.keysym, pressed)
 
-        if e.keysym == self.settings.up:
-            self.k_up = False
+            if pressed:
+                if not InputController.TIMED_FLAGS.isdisjoint(flags):
+                    self.press_times.append(time)
+                self.dispatch(self.press_handlers, e)
+            else:
+                self.dispatch(self.release_handlers, e)
 
-        if e.keysym == self.settings.down:
-            self.k_down = False
+    def respond(self):
+        """Mark that the player reacted to the inputs in this frame"""
+        self.responded = True
 
-        if e.keysym == self.settings.action:
-            self.k_action = False
+    def take_response_times(self):
+        """Return the arrival times of the key presses responded to this frame
 
-        if e.keysym == self.settings.pause:
-            self.k_pause = False
-
-        for t, h in self.handlers:
-            if t == "release" and h(e):
-                break
+        Key presses which have gone unanswered for too long are forgotten
+        """
+        if self.responded:
+            times, self.press_times = self.press_times, []
+            self.responded = False
+            return times
+
+        now = perf_counter()
+        self.press_times = [
+            time for time in self.press_times
+            if now - time < InputController.LATENCY_TIMEOUT
+        ]
+        return []
+
+    @staticmethod
+    def add_handler(handlers, callback, states):
+        """Register a handler for some game states
+
+        :param handlers: Lists of handlers for each state
+        :param callback: The handler to register
+        :param states: The game states to handle events in, or None for all
+        """
+        for state in (None,) if states is None else states:
+            handlers.setdefault(state, []).append(callback)
 
-    def add_keypress_handler(self, callback):
+    def add_keypress_handler(self, callback, states=None):
         """Register a key press listener
 
         :param callback:
+        :param states: The game states to listen in, or None for all
         """
-        self.handlers.insert(0, ("press", callback))
+        InputController.add_handler(self.press_handlers, callback, states)
 
-    def add_keyrelease_handler(self, callback):
+    def add_keyrelease_handler(self, callback, states=None):
         """Register a key release listener
 
         :param callback:
+        :param states: The game states to listen in, or None for all
         """
-        self.handlers.insert(0, ("release", callback))
+        InputController.add_handler(self.release_handlers, callback, states)
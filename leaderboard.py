@@ -1,52 +1,153 @@
-from os import path
+from os import stat
 from random import randint
 from typing import List
 
 from config import Config
 from font import Font
 from game import Game, GameSprite
+from leaderboard_service import LeaderboardClient
+from leaderboard_store import LeaderboardStore
 
 
 class LeaderboardFile:
-    """Object to manage saving and loading the leaderboard"""
+    """Object to manage saving and loading the leaderboard
 
-    def __init__(self):
-        """Initialise the leaderboard file"""
+    The highest entries are cached, and only read again from the store when
+    the leaderboard files are changed by something else
+    """
+
+    # number of the highest entries to keep in memory
+    CACHE_SIZE = 64
+
+    def __init__(self, filename=Config.LEADERBOARD_FILE, writer=None):
+        """Initialise the leaderboard file
+
+        :param filename: The file the leaderboard is kept in
+        :param writer: Background writer to add entries with, or None to
+                       write them straight away
+        """
+        self.store = LeaderboardStore(filename)
+        self.writer = writer
         self.entries = []
 
+        # highest entries, sorted with the highest score first
+        self.cache = []
+        # modification times and sizes of the files the cache was read from
+        self.signature = None
+
+    @staticmethod
+    def get_file_signature(filename):
+        """Return the modification time and size of a file
+
+        :param filename: The file to check
+        """
+        try:
+            stat_result = stat(filename)
+        except FileNotFoundError:
+            return None
+        return (stat_result.st_mtime_ns, stat_result.st_size)
+
+    def get_signature(self):
+        """Return the signatures of every file the store uses"""
+        return (LeaderboardFile.get_file_signature(self.store.filename),
+                LeaderboardFile.get_file_signature(self.store.tail_filename))
+
     def load_entries(self):
-        """Load leaderboard entries from a file"""
-        self.entries = []
-        if path.exists(Config.LEADERBOARD_FILE):
-            with open(Config.LEADERBOARD_FILE, "rb") as file:
-                while (entry := file.read(8 + Config.NICK_LEN)):
-                    name = entry[0:Config.NICK_LEN]
-                    score = entry[Config.NICK_LEN:11]
-                    score_entry = (name.decode("ascii"),
-                                   int.from_bytes(score, byteorder="little"))
-                    self.entries.append(score_entry)
-            self.sort_entries()
-
-    def sort_entries(self):
-        """Sort leaderboard entries"""
-        self.entries.sort(key=(lambda e: e[1]))
-        self.entries.reverse()
+        """Load every leaderboard entry from the file"""
+        self.store.open()
+        self.entries = self.store.top(len(self.store))
+
+    def refresh(self):
+        """Reload the store and the cache if the files have changed"""
+        # entries which are still being written are only in memory
+        if self.writer is not None \
+                and self.writer.is_pending(self.store.tail_filename):
+            return
+
+        signature = self.get_signature()
+        if signature != self.signature:
+            self.store.open()
+            self.cache = self.store.top(LeaderboardFile.CACHE_SIZE)
+            self.signature = signature
+
+    def get_entries(self, start, count):
+        """Return a run of entries, highest score first
+
+        :param start: The position of the first entry, 0 for the highest
+        :param count: The number of entries to return
+        """
+        self.refresh()
+        if start + count > LeaderboardFile.CACHE_SIZE:
+            return self.store.window(start, count)
+        return self.cache[start:start + count]
+
+    def poll(self):
+        """Return whether the entries have changed since this was last called
+
+        Entries are read from the files when they are asked for, so there is
+        never anything new to draw
+        """
+        return False
+
+    def iter_entries(self):
+        """Yield every entry, highest score first, without loading them all"""
+        self.refresh()
+        return self.store.iter_entries()
+
+    def count(self):
+        """Return the number of entries"""
+        self.refresh()
+        return len(self.store)
+
+    def rank(self, score):
+        """Return the position of a score, 1 for the highest
+
+        :param score: The score to find the rank of
+        """
+        self.refresh()
+        return self.store.rank(score)
 
     def save_entries(self):
-        """Save leaderboard entries"""
-        with open(Config.LEADERBOARD_FILE, "wb") as file:
-            for name, score in self.entries:
-                file.write(bytes(name[0:Config.NICK_LEN], "ascii"))
-                file.write(int(score).to_bytes(8, "little"))
+        """Merge every entry into the sorted leaderboard file"""
+        if self.writer is not None:
+            self.writer.flush()
+        self.store.open()
+        self.store.compact()
+        self.signature = None
 
     def add_entry(self, name, score):
         """Add a leaderboard entry
 
+        The entry is added to the entries in memory straight away, and the
+        files are written in the background if there is a writer
+
         :param name: Initials of the player
         :param score: The sore that was achieved
         """
-        self.entries.append((name, score))
-        self.sort_entries()
+        self.refresh()
+        self.store.insert_tail(name, score)
+        LeaderboardStore.insert_entry(self.cache, name, score)
+        del self.cache[LeaderboardFile.CACHE_SIZE:]
+
+        if self.writer is None:
+            self.write_entries([(name, score)])
+            self.signature = self.get_signature()
+        else:
+            self.writer.append(self.store.tail_filename, (name, score),
+                               self.write_entries)
+
+    def write_entries(self, entries):
+        """Add entries to the leaderboard files
+
+        :param entries: The entries to add, as pairs of name and score
+        """
+        store = LeaderboardStore(self.store.filename)
+        store.add_entries(entries)
+        store.close()
+
+    def close(self):
+        """Release the leaderboard files"""
+        self.store.close()
 
 
 class NameEntryLetter(GameSprite):
@@ -67,7 +168,8 @@ class NameEntryLetter(GameSprite):
 class NameEntry():
     """An initial entry element, allowing the user to enter their initials"""
 
-    def __init__(self, game: Game, callback, num_letters=3, position=(0, 0)):
+    def __init__(self, game: Game, callback, num_letters=3, position=(0, 0),
+                 states=None):
         """Initialise the name entry
 
         :param game: The game which this belongs to
@@ -75,6 +177,7 @@ class NameEntry():
         :param callback: callback to call when the entry is complete
         :param num_letters: Number of letters to use for the initials
         :param position: Position of this element
+        :param states: The game states this entry can be used in
         """
         self.game = game
         self.callback = callback
@@ -88,9 +191,11 @@ class NameEntry():
         self.selection = 0
 
         self.hidden = True
+        self.blink_timer = None
+        self.blink_on = True
 
         self.populate_letters(num_letters)
-        self.game.inputs.add_keypress_handler(self.on_key)
+        self.game.inputs.add_keypress_handler(self.on_key, states)
         self.set_pos(position)
 
     def populate_letters(self, num_letters):
@@ -199,6 +304,8 @@ class NameEntry():
                 letter.send_to_front()
             self.button.show()
             self.button.send_to_front()
+            self.blink_timer = self.game.ui_timers.schedule(
+                Leaderboard.BLINK_TIME, self.blink, repeat=True)
             self.hidden = False
 
     def hide(self):
@@ -207,23 +314,19 @@ class NameEntry():
             for letter in self.letters:
                 letter.hide()
             self.button.hide()
+            self.blink_timer.cancel()
+            self.blink_timer = None
             self.hidden = True
 
-    def tick(self):
-        """Update the state of this object"""
-        if not self.hidden:
-            selected = self.get_selected_letter()
-            for letter in self.letters + [self.button]:
-                if self.game.alpha//15 == self.game.alpha / 15:
-                    if letter == selected:
-                        if (self.game.alpha//15) % 2 == 0:
-                            self.get_selected_letter().show()
-                        else:
-                            self.get_selected_letter().hide()
-                    else:
-                        letter.show()
-        else:
-            self.hide()
+    def blink(self):
+        """Blink the selected letter"""
+        self.blink_on = not self.blink_on
+        selected = self.get_selected_letter()
+        for letter in self.letters + [self.button]:
+            if letter == selected and not self.blink_on:
+                letter.hide()
+            else:
+                letter.show()
 
 
 class Leaderboard:
@@ -231,67 +334,113 @@ class Leaderboard:
 
     ANIMATION_TIME = 5
     ANIMATION_DELAY = 5
+    # number of frames between each blink
+    BLINK_TIME = 15
 
-    def __init__(self, game: Game):
+    def __init__(self, game: Game, states=None, entry_states=None):
         """Initialise the leaderboard
 
         :param game: The game which this belongs to
         :type game: Game
+        :param states: The game states the leaderboard can be used in
+        :param entry_states: The game states names can be entered in
         """
         self.game = game
-        self.file = LeaderboardFile()
+        if Config.LEADERBOARD_SERVER is None:
+            self.file = LeaderboardFile(writer=game.writer)
+        else:
+            self.file = LeaderboardClient(Config.LEADERBOARD_SERVER)
+        # sprites currently in use, the title followed by the visible rows
         self.entries = []
         self.editing = True
         self.padding = 5
 
+        image = Font.load_text(self.game.texture_factory, "leaderboard")
+        self.title = GameSprite(self.game, image)
+
+        # pool of row sprites, with the text and image each one shows
+        self.rows = []
+        self.row_texts = []
+        self.row_images = []
+
+        # position of the first visible entry, and the number of visible rows
+        self.scroll = 0
+        self.page_size = 0
+
         self.callback = (lambda: None)
 
         self.hidden = True
 
-        self.game.inputs.add_keypress_handler(self.on_key)
-        self.name_entry = NameEntry(self.game, self.submit_name)
+        self.game.inputs.add_keypress_handler(self.on_key, states)
+        self.name_entry = NameEntry(
+            self.game, self.submit_name, states=entry_states)
 
+        self.blink_entry = ("", 0)
         self.blinking_sprite = None
+        self.blink_timer = None
         self.animation_start = -1
 
+    def get_rows_to_fit(self):
+        """Return the number of entries that fit on the screen"""
+        editing_area = 0
+        if self.editing:
+            editing_area = Font.FONT_SIZE + self.padding*2
+        remaining_area = self.game.h - self.padding*2 - editing_area
+
+        return remaining_area // (Font.FONT_SIZE+self.padding) - 1
+
+    def get_row(self, index, text):
+        """Return a pooled row sprite showing some text
+
+        The text is only drawn again when it differs from what the row
+        already shows
+
+        :param index: The index of the row
+        :param text: The text for the row to show
+        """
+        if index == len(self.rows):
+            image = Font.load_text(
+                self.game.texture_factory, text, cache=False)
+            self.rows.append(GameSprite(self.game, image))
+            self.row_texts.append(text)
+            self.row_images.append(image)
+        elif self.row_texts[index] != text:
+            image = Font.load_text(
+                self.game.texture_factory, text, cache=False)
+            self.rows[index].set_image(image)
+            self.row_texts[index] = text
+            self.row_images[index] = image
+
+        return self.rows[index]
+
     def populate_entries(self, blink_entry=("", 0)):
         """Populate entries.
 
         :param blink_entry:
         """
         self.clear_entries()
-        self.file.load_entries()
+        self.blink_entry = blink_entry
 
-        editing_area = 0
-        if self.editing:
-            editing_area = Font.FONT_SIZE + self.padding*2
-        remaining_area = self.game.h - self.padding*2 - editing_area
-
-        to_fit = remaining_area // (Font.FONT_SIZE+self.padding) - 1
-
-        to_draw = self.file.entries[0:to_fit]
+        self.page_size = self.get_rows_to_fit()
+        to_draw = self.file.get_entries(self.scroll, self.page_size)
 
         # create a row variable that is incremented for each entry
         y = self.padding
 
-        # create the title sprite and increment the row
-        image = Font.load_text(self.game.texture_factory, "leaderboard")
-        sprite = GameSprite(self.game, image)
-        sprite.set_pos((0, y))
-        self.entries.append(sprite)
-        x = (self.game.w - sprite.w) // 2
-        sprite.set_pos((x, y))
+        # place the title sprite and increment the row
+        x = (self.game.w - self.title.w) // 2
+        self.title.set_pos((x, y))
+        self.entries.append(self.title)
 
-        y += sprite.h + self.padding
+        y += self.title.h + self.padding
 
         # calculate the number of zeros to pad the score by
         zfill = ((self.game.w-self.padding*2) //
                  (Font.FONT_SIZE+1)) - Config.NICK_LEN - 5
-        for name, score in to_draw:
+        for i, (name, score) in enumerate(to_draw):
             text = f"{name}     {str(score).zfill(zfill)}"
             x = self.padding
-            image = Font.load_text(self.game.texture_factory, text)
-            sprite = GameSprite(self.game, image)
+            sprite = self.get_row(i, text)
             sprite.set_pos((x, y))
 
             if (name, score) == blink_entry:
@@ -300,12 +449,27 @@ class Leaderboard:
 
             y += sprite.h + self.padding
 
+        if not self.hidden:
+            for sprite in self.entries:
+                sprite.show()
+
         if self.editing:
             self.name_entry.set_pos((self.padding, y+self.padding))
             self.name_entry.show()
         else:
             self.name_entry.hide()
 
+    def scroll_by(self, rows):
+        """Move the visible rows through the leaderboard
+
+        :param rows: The number of rows to move down by, negative for up
+        """
+        last = max(0, self.file.count() - self.page_size)
+        scroll = min(max(0, self.scroll + rows), last)
+        if scroll != self.scroll:
+            self.scroll = scroll
+            self.populate_entries()
+
     def start_animation(self):
         """Start the animation."""
         for e in self.entries:
@@ -319,11 +483,24 @@ class Leaderboard:
         :param _: The key press event to handle
         """
         inp = self.game.inputs
-        if not self.hidden and inp.k_action and not self.editing:
+        if self.hidden or self.editing:
+            return False
+
+        if inp.k_action:
             self.callback()
             return True
 
-        return False
+        if inp.k_down:
+            self.scroll_by(1)
+        elif inp.k_up:
+            self.scroll_by(-1)
+        elif inp.k_right:
+            self.scroll_by(self.page_size)
+        elif inp.k_left:
+            self.scroll_by(-self.page_size)
+        else:
+            return False
+        return True
 
     def submit_name(self, name):
         """Submit a name to the leaderboard
@@ -332,15 +509,32 @@ class Leaderboard:
         """
         score = self.game.score
         self.file.add_entry(name, score)
-        self.file.save_entries()
 
         self.editing = False
         self.name_entry.hide()
 
+        # show the page that the new entry is on
+        page_size = self.get_rows_to_fit()
+        self.scroll = (self.file.rank(score) - 1) // page_size * page_size
+
         self.populate_entries(blink_entry=(name, score))
         self.start_animation()
         for e in self.entries:
             e.show()
+        self.start_blinking()
+
+    def start_blinking(self):
+        """Blink the entry that was just submitted, if it is visible"""
+        if self.blinking_sprite is not None:
+            self.blink_timer = self.game.ui_timers.schedule(
+                Leaderboard.BLINK_TIME, self.blink, repeat=True)
+
+    def blink(self):
+        """Blink the entry that was just submitted"""
+        if self.blinking_sprite.hidden:
+            self.blinking_sprite.show()
+        else:
+            self.blinking_sprite.hide()
 
     def animate_sprite(self, sprite, i):
         """Animate a single sprite.
@@ -368,6 +562,11 @@ class Leaderboard:
 
     def tick(self):
         """Update the leaderboard"""
+        # entries from a leaderboard service may arrive after being drawn
+        if not self.hidden and not self.editing and self.file.poll():
+            self.populate_entries(self.blink_entry)
+            self.start_blinking()
+
         animation_complete = True
         for i, sprite in enumerate(self.entries):
             sprite.send_to_front()
@@ -382,13 +581,6 @@ class Leaderboard:
             if animation_complete \
                     and animation_time > Leaderboard.ANIMATION_TIME:
                 self.name_entry.show()
-                self.name_entry.tick()
-        else:
-            if self.blinking_sprite is not None:
-                if (self.game.alpha//15) % 2 == 0:
-                    self.blinking_sprite.show()
-                else:
-                    self.blinking_sprite.hide()
 
     def show(self):
         """Make this object visible"""
@@ -405,6 +597,9 @@ class Leaderboard:
             for m in self.entries:
                 m.hide()
             self.name_entry.hide()
+            if self.blink_timer is not None:
+                self.blink_timer.cancel()
+                self.blink_timer = None
             self.hidden = True
 
     def start_editing(self):
@@ -412,12 +607,21 @@ class Leaderboard:
         self.editing = True
         self.blinking_sprite = None
 
+    def close(self):
+        """Finish writing and release the leaderboard"""
+        self.file.close()
+
     def clear_entries(self):
-        """Remove all the associated objects"""
+        """Hide the rows that are in use, ready for them to be reused"""
         for entry in self.entries:
-            entry.destroy()
+            entry.hide()
         self.entries = []
 
+        if self.blink_timer is not None:
+            self.blink_timer.cancel()
+            self.blink_timer = None
+        self.blinking_sprite = None
+
 
 # test to add entries to game leaderboard
 if __name__ == "__main__":
@@ -437,7 +641,7 @@ if __name__ == "__main__":
         else:
             break
 
+    lb.save_entries()
+    lb.load_entries()
     for input_name, input_score in lb.entries:
         print(f"{input_name} {input_score}")
-
-    lb.save_entries()
@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+
+import json
+from argparse import ArgumentParser
+from bisect import bisect_left
+from os import path, remove
+from random import getrandbits
+from socket import AF_INET, AF_UNIX, SOCK_STREAM, socket
+from socketserver import (StreamRequestHandler, ThreadingTCPServer,
+                          ThreadingUnixStreamServer)
+from sys import stderr
+from threading import Condition, Lock, Thread
+from time import monotonic
+
+from config import Config
+from leaderboard_store import LeaderboardStore
+
+
+class LeaderboardRequestHandler(StreamRequestHandler):
+    """Handles the requests sent over one connection to the service
+
+    Each request and response is a line of JSON
+    """
+
+    def handle(self):
+        """Answer requests until the client disconnects"""
+        for line in self.rfile:
+            try:
+                response = self.server.leaderboard.handle_request(
+                    json.loads(line))
+            except (ValueError, KeyError, TypeError) as error:
+                response = {"error": f"invalid request: {error}"}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class LeaderboardServer:
+    """Local service which owns the leaderboard store
+
+    Games connect to the service instead of reading and writing the
+    leaderboard files themselves
+    """
+
+    def __init__(self, address, filename=Config.LEADERBOARD_FILE) -> None:
+        """Initialise the server
+
+        :param address: The path of a unix socket, or a (host, port) pair
+        :param filename: The file to keep the leaderboard in
+        :rtype: None
+        """
+        self.address = address
+        self.store = LeaderboardStore(filename)
+        self.lock = Lock()
+        # incremented whenever the leaderboard changes, and only meaningful
+        # together with the epoch, which is chosen afresh by each process
+        self.epoch = getrandbits(32)
+        self.version = 0
+
+        if isinstance(address, str):
+            if path.exists(address):
+                remove(address)
+            self.server = ThreadingUnixStreamServer(
+                address, LeaderboardRequestHandler)
+        else:
+            ThreadingTCPServer.allow_reuse_address = True
+            self.server = ThreadingTCPServer(
+                address, LeaderboardRequestHandler)
+        self.server.daemon_threads = True
+        self.server.leaderboard = self
+
+    def handle_request(self, request):
+        """Carry out a request and return the response
+
+        :param request: The decoded request
+        """
+        with self.lock:
+            operation = request["op"]
+            if operation == "add":
+                self.store.add_entries(
+                    [(name, int(score)) for name, score in request["entries"]])
+                self.version += 1
+                return {"version": self.version}
+
+            if operation == "window":
+                if request.get("epoch") == self.epoch \
+                        and request.get("version") == self.version:
+                    return {"epoch": self.epoch, "version": self.version,
+                            "unchanged": True}
+                return {
+                    "epoch": self.epoch,
+                    "version": self.version,
+                    "count": len(self.store),
+                    "entries": self.store.window(
+                        int(request["start"]), int(request["count"]))
+                }
+
+            if operation == "count":
+                return {"version": self.version, "count": len(self.store)}
+
+            if operation == "rank":
+                return {"version": self.version,
+                        "rank": self.store.rank(int(request["score"]))}
+
+            if operation == "compact":
+                self.store.compact()
+                return {"version": self.version}
+
+        return {"error": f"unknown operation {operation}"}
+
+    def serve_forever(self):
+        """Answer requests until shutdown is called"""
+        self.server.serve_forever()
+
+    def shutdown(self):
+        """Stop serving and release the socket"""
+        self.server.shutdown()
+        self.server.server_close()
+        if isinstance(self.address, str) and path.exists(self.address):
+            remove(self.address)
+
+
+class LeaderboardClient:
+    """Leaderboard which is kept by a leaderboard service
+
+    This can be used in place of a LeaderboardFile.  Reads are answered from
+    entries kept in memory, so the game never waits on the service: a
+    worker thread sends submitted entries in batches, and refreshes the
+    cached entries whenever the service reports that they have changed.
+    Connections are kept open and reused
+    """
+
+    # number of idle connections to keep open
+    POOL_SIZE = 2
+    # number of submitted entries to collect before sending them
+    BATCH_SIZE = 16
+    # seconds a submitted entry can wait for its batch to fill up
+    BATCH_TIME = 5.0
+    # number of the highest entries to keep in memory
+    CACHE_SIZE = 64
+    # seconds to wait for the service before giving up
+    TIMEOUT = 1.0
+    # seconds to wait before trying again once the service is unavailable
+    RETRY_TIME = 2.0
+
+    def __init__(self, address=Config.LEADERBOARD_SERVER) -> None:
+        """Initialise the client and start its worker thread
+
+        :param address: The path of a unix socket, or a (host, port) pair
+        :rtype: None
+        """
+        self.address = address
+        self.entries = []
+        self.condition = Condition()
+
+        # open connections which are not in use
+        self.idle = []
+        # submitted entries which have not been sent yet, the entries being
+        # sent, and the time the oldest waiting entry was submitted
+        self.pending = []
+        self.sending = []
+        self.pending_time = None
+
+        # highest entries, and the epoch and version of the leaderboard they
+        # are from
+        self.cache = []
+        self.epoch = None
+        self.version = None
+        # number of entries the service had when the cache was refreshed
+        self.total = 0
+
+        # entries beyond the cache, and the position of the first of them
+        self.window = []
+        self.window_start = None
+        # position and number of entries to fetch beyond the cache
+        self.wanted = None
+
+        # whether the cache should be checked against the service
+        self.stale = True
+        # whether the cached entries have changed since poll was called
+        self.changed = False
+        # number of flushes requested, and the number carried out
+        self.flushes = 0
+        self.flushed = 0
+
+        # whether the service answered the last request, and the time before
+        # which it is not tried again after it failed to
+        self.available = True
+        self.retry_time = None
+
+        self.running = True
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def connect(self):
+        """Open a new connection to the service"""
+        family = AF_UNIX if isinstance(self.address, str) else AF_INET
+        connection = socket(family, SOCK_STREAM)
+        connection.settimeout(LeaderboardClient.TIMEOUT)
+        try:
+            connection.connect(self.address)
+        except OSError:
+            connection.close()
+            raise
+        return (connection, connection.makefile("rb"))
+
+    def release(self, connection):
+        """Return a connection to the pool, or close it if the pool is full
+
+        :param connection: The connection to release
+        """
+        with self.condition:
+            if len(self.idle) < LeaderboardClient.POOL_SIZE:
+                self.idle.append(connection)
+                return
+        LeaderboardClient.close_connection(connection)
+
+    @staticmethod
+    def close_connection(connection):
+        """Close a connection
+
+        :param connection: The connection to close
+        """
+        sock, reader = connection
+        reader.close()
+        sock.close()
+
+    def request(self, **request):
+        """Send a request to the service and return its response
+
+        This waits on the service, so it is only called from the worker
+        thread, or by tools which are not drawing anything
+
+        :returns: The decoded response, or None if the service is unavailable
+        """
+        with self.condition:
+            connection = self.idle.pop() if self.idle else None
+        try:
+            if connection is None:
+                connection = self.connect()
+        except OSError as error:
+            self.set_unavailable(error)
+            return None
+
+        sock, reader = connection
+        try:
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            line = reader.readline()
+            if not line:
+                raise ConnectionError("connection closed by service")
+            response = json.loads(line)
+        except (OSError, ValueError) as error:
+            LeaderboardClient.close_connection(connection)
+            self.set_unavailable(error)
+            return None
+
+        self.release(connection)
+        self.set_available()
+        if "error" in response:
+            print(f"Leaderboard service error: {response['error']}",
+                  file=stderr)
+            return None
+        return response
+
+    def set_unavailable(self, error):
+        """Wait before using the service again, after a request failed
+
+        The outage is only reported when it starts, not for every attempt
+
+        :param error: The error the request failed with
+        """
+        with self.condition:
+            if self.available:
+                print(f"Leaderboard service unavailable: {error}",
+                      file=stderr)
+            self.available = False
+            self.retry_time = monotonic() + LeaderboardClient.RETRY_TIME
+
+    def set_available(self):
+        """Carry on using the service, after a request succeeded"""
+        with self.condition:
+            if not self.available:
+                print("Leaderboard service available again", file=stderr)
+            self.available = True
+            self.retry_time = None
+
+    def is_retrying(self):
+        """Return whether the service is being given time to come back"""
+        return self.retry_time is not None and monotonic() < self.retry_time
+
+    def is_batch_due(self):
+        """Return whether the submitted entries should be sent now"""
+        if not self.pending:
+            return False
+        if self.flushes > self.flushed or not self.running:
+            return True
+        if self.is_retrying():
+            return False
+        return len(self.pending) >= LeaderboardClient.BATCH_SIZE \
+            or monotonic() - self.pending_time >= LeaderboardClient.BATCH_TIME
+
+    def is_due(self):
+        """Return whether the worker thread has anything to do now"""
+        if not self.running or self.flushes > self.flushed:
+            return True
+        if self.is_retrying():
+            return False
+        return self.stale or self.wanted is not None or self.is_batch_due()
+
+    def get_wait(self):
+        """Return the seconds until the worker thread has something to do,
+        or None if that depends on the game
+        """
+        now = monotonic()
+        if self.is_retrying():
+            return self.retry_time - now
+        if not self.pending:
+            return None
+        return max(0.0, self.pending_time + LeaderboardClient.BATCH_TIME
+                   - now)
+
+    def run(self):
+        """Send entries and refresh the cache until the client is closed"""
+        while True:
+            with self.condition:
+                while not self.is_due():
+                    self.condition.wait(self.get_wait())
+
+                running = self.running
+                if self.is_batch_due():
+                    self.sending, self.pending = self.pending, []
+                    self.pending_time = None
+                flushes = self.flushes
+                refresh = self.stale or self.wanted is not None
+                self.stale = False
+
+            try:
+                sent = not self.sending or self.send_entries()
+                # a failed batch means the service is unavailable
+                if refresh and running and sent:
+                    self.refresh()
+            finally:
+                with self.condition:
+                    self.flushed = flushes
+                    self.condition.notify_all()
+
+            if not running:
+                return
+
+    def send_entries(self):
+        """Send the batch of entries taken from the submitted entries
+
+        :returns: Whether the entries were sent
+        """
+        response = self.request(op="add", entries=self.sending)
+        with self.condition:
+            if response is None and self.running:
+                # try again with the next batch
+                self.pending[:0] = self.sending
+                self.pending_time = monotonic()
+            else:
+                self.total += len(self.sending)
+            self.sending = []
+            self.stale = True
+        return response is not None
+
+    def refresh(self):
+        """Update the cached entries if the service reports they changed"""
+        with self.condition:
+            epoch, version = self.epoch, self.version
+            wanted, self.wanted = self.wanted, None
+
+        response = self.request(op="window", start=0,
+                                count=LeaderboardClient.CACHE_SIZE,
+                                epoch=epoch, version=version)
+        if response is None:
+            # try again once the service is back
+            with self.condition:
+                self.stale = True
+                if self.wanted is None:
+                    self.wanted = wanted
+            return
+
+        if not response.get("unchanged"):
+            cache = [tuple(entry) for entry in response["entries"]]
+            with self.condition:
+                # entries which have not been sent yet stay in the cache
+                for name, score in self.pending:
+                    LeaderboardStore.insert_entry(cache, name, score)
+                del cache[LeaderboardClient.CACHE_SIZE:]
+                self.cache = cache
+                self.epoch = response["epoch"]
+                self.version = response["version"]
+                self.total = response["count"]
+                self.changed = True
+
+                # the entries further down may have moved too
+                if wanted is None and self.window_start is not None:
+                    wanted = (self.window_start, len(self.window))
+
+        if wanted is not None:
+            start, count = wanted
+            response = self.request(op="window", start=start, count=count)
+            if response is None:
+                with self.condition:
+                    if self.wanted is None:
+                        self.wanted = wanted
+            else:
+                with self.condition:
+                    self.window = [tuple(entry)
+                                   for entry in response["entries"]]
+                    self.window_start = start
+                    self.changed = True
+
+    def poll(self):
+        """Return whether the entries have changed since this was last called
+
+        The entries are refreshed in the background, so anything showing them
+        should be drawn again when this returns True
+        """
+        with self.condition:
+            changed, self.changed = self.changed, False
+        return changed
+
+    def flush(self):
+        """Wait until the submitted entries have been sent"""
+        with self.condition:
+            self.flushes += 1
+            target = self.flushes
+            self.condition.notify_all()
+            while self.flushed < target and self.thread.is_alive():
+                self.condition.wait()
+
+    def load_entries(self):
+        """Load every leaderboard entry from the service"""
+        self.flush()
+        response = self.request(op="count")
+        count = 0 if response is None else response["count"]
+        response = self.request(op="window", start=0, count=count)
+        self.entries = [] if response is None else [
+            tuple(entry) for entry in response["entries"]]
+
+    def get_entries(self, start, count):
+        """Return a run of entries, highest score first
+
+        Entries are returned from memory.  Any which have not been fetched
+        yet are asked for, and poll reports when they have arrived
+
+        :param start: The position of the first entry, 0 for the highest
+        :param count: The number of entries to return
+        """
+        with self.condition:
+            self.stale = True
+            self.condition.notify_all()
+
+            if start + count <= LeaderboardClient.CACHE_SIZE:
+                return self.cache[start:start + count]
+
+            window_end = (self.window_start or 0) + len(self.window)
+            if self.window_start is not None \
+                    and self.window_start <= start \
+                    and (start + count <= window_end
+                         or window_end >= self.count()):
+                offset = start - self.window_start
+                return self.window[offset:offset + count]
+
+            # fetch the pages either side too, so scrolling seldom waits
+            self.wanted = (max(0, start - count), count * 3)
+            return []
+
+    def count(self):
+        """Return the number of entries, including those not sent yet"""
+        with self.condition:
+            return self.total + len(self.pending) + len(self.sending)
+
+    def rank(self, score):
+        """Return the position of a score, 1 for the highest
+
+        The rank is worked out from the entries in memory, so it is only a
+        guess when the score is below every cached entry and is not among
+        the entries fetched beyond them, in which case it is put last
+
+        :param score: The score to find the rank of
+        """
+        with self.condition:
+            above = bisect_left([-entry[1] for entry in self.cache], -score)
+            if above < len(self.cache) or len(self.cache) >= self.count():
+                return above + 1
+
+            if self.window:
+                above = bisect_left(
+                    [-entry[1] for entry in self.window], -score)
+                if 0 < above < len(self.window):
+                    return self.window_start + above + 1
+
+            return self.count()
+
+    def save_entries(self):
+        """Send pending entries and have the service merge its files"""
+        self.flush()
+        self.request(op="compact")
+
+    def add_entry(self, name, score):
+        """Submit a leaderboard entry
+
+        The entry is shown in the cached entries straight away, but only sent
+        once enough entries have been collected or it has waited long enough
+
+        :param name: Initials of the player
+        :param score: The sore that was achieved
+        """
+        with self.condition:
+            self.pending.append((name, score))
+            if self.pending_time is None:
+                self.pending_time = monotonic()
+            LeaderboardStore.insert_entry(self.cache, name, score)
+            del self.cache[LeaderboardClient.CACHE_SIZE:]
+            self.condition.notify_all()
+
+    def close(self):
+        """Send pending entries and close every connection"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join()
+
+        for connection in self.idle:
+            LeaderboardClient.close_connection(connection)
+        self.idle = []
+
+
+def main():
+    """Run the leaderboard service"""
+    parser = ArgumentParser(description="Serve a leaderboard to local games")
+    parser.add_argument("-s", "--socket",
+                        help="path of a unix socket to listen on")
+    parser.add_argument("-p", "--port", type=int,
+                        help="localhost port to listen on")
+    parser.add_argument("-f", "--file", default=Config.LEADERBOARD_FILE,
+                        help="file to keep the leaderboard in")
+    args = parser.parse_args()
+
+    if args.socket:
+        address = args.socket
+    elif args.port:
+        address = ("127.0.0.1", args.port)
+    else:
+        parser.error("either --socket or --port is needed")
+
+    server = LeaderboardServer(address, args.file)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import mmap
+from bisect import bisect_left, insort
+from heapq import merge
+from os import path, remove, replace
+from struct import Struct
+
+from config import Config
+
+
+class LeaderboardStore:
+    """Leaderboard kept on disk as fixed width records sorted by score
+
+    The main file holds records in descending order of score and is memory
+    mapped, so the top entries and the rank of a score are found without
+    reading the whole file.  New entries are appended to a small unsorted
+    tail file, which is merged into the main file once it grows too large
+    """
+
+    # a record is the player's initials followed by their score
+    RECORD = Struct(f"<{Config.NICK_LEN}sQ")
+    # number of entries the tail can hold before it is merged
+    TAIL_LIMIT = 256
+    # number of records read from the main file at a time when merging
+    CHUNK = 4096
+
+    def __init__(self, filename=Config.LEADERBOARD_FILE) -> None:
+        """Initialise the store
+
+        :param filename: The file to keep the sorted records in
+        :rtype: None
+        """
+        self.filename = filename
+        self.tail_filename = f"{filename}.tail"
+
+        self.file = None
+        self.map = None
+        self.count = 0
+        # entries in the tail, sorted with the highest score first
+        self.tail = []
+
+        self.open()
+
+    def open(self):
+        """Map the main file and read the tail into memory"""
+        self.close()
+
+        if path.exists(self.filename):
+            self.file = open(self.filename, "rb")
+            size = path.getsize(self.filename)
+            self.count = size // LeaderboardStore.RECORD.size
+            if self.count:
+                self.map = mmap.mmap(
+                    self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.tail = []
+        if path.exists(self.tail_filename):
+            with open(self.tail_filename, "rb") as file:
+                data = file.read()
+            end = len(data) - len(data) % LeaderboardStore.RECORD.size
+            for name, score in LeaderboardStore.RECORD.iter_unpack(
+                    data[:end]):
+                self.insert_tail(LeaderboardStore.decode(name), score)
+
+    def close(self):
+        """Unmap the main file"""
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.count = 0
+
+    @staticmethod
+    def encode(name, score):
+        """Pack an entry into a record
+
+        :param name: Initials of the player
+        :param score: The score that was achieved
+        """
+        name = bytes(name[0:Config.NICK_LEN], "ascii")
+        return LeaderboardStore.RECORD.pack(
+            name.ljust(Config.NICK_LEN), int(score))
+
+    @staticmethod
+    def decode(name):
+        """Turn the name field of a record into a string
+
+        :param name: The name field of a record
+        """
+        return name.decode("ascii")
+
+    def insert_tail(self, name, score):
+        """Add an entry to the sorted copy of the tail
+
+        Entries are placed before any others with the same score, so newer
+        entries rank above older ones
+
+        :param name: Initials of the player
+        :param score: The score that was achieved
+        """
+        insort(self.tail, (-score, -len(self.tail), name))
+
+    @staticmethod
+    def insert_entry(entries, name, score):
+        """Insert an entry into a list sorted with the highest score first
+
+        Entries are placed before any others with the same score, so newer
+        entries rank above older ones
+
+        :param entries: The list of (name, score) pairs to insert into
+        :param name: Initials of the player
+        :param score: The score that was achieved
+        """
+        index = bisect_left([-entry[1] for entry in entries], -score)
+        entries.insert(index, (name, score))
+
+    def tail_entries(self):
+        """Return the entries in the tail, highest score first"""
+        return [(name, -score) for score, _, name in self.tail]
+
+    def get_record(self, index):
+        """Return an entry from the main file
+
+        :param index: The position of the entry, 0 for the highest score
+        """
+        name, score = LeaderboardStore.RECORD.unpack_from(
+            self.map, index * LeaderboardStore.RECORD.size)
+        return (LeaderboardStore.decode(name), score)
+
+    def get_score(self, index):
+        """Return the score of an entry in the main file
+
+        :param index: The position of the entry, 0 for the highest score
+        """
+        return LeaderboardStore.RECORD.unpack_from(
+            self.map, index * LeaderboardStore.RECORD.size)[1]
+
+    def count_above(self, score):
+        """Return the number of entries in the main file beating a score
+
+        :param score: The score to compare against
+        """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_score(middle) > score:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def __len__(self):
+        """Return the total number of entries"""
+        return self.count + len(self.tail)
+
+    def top(self, k):
+        """Return the k highest scoring entries, highest first
+
+        :param k: The number of entries to return
+        """
+        return self.window(0, k)
+
+    def count_tail_before(self, start):
+        """Return how many of the first entries come from the tail
+
+        :param start: The number of entries at the top of the leaderboard
+        """
+        # tail entries go above main entries with the same score
+        low = max(0, start - self.count)
+        high = min(start, len(self.tail))
+        while low < high:
+            middle = (low + high) // 2
+            if -self.tail[middle][0] >= self.get_score(start - middle - 1):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def window(self, start, count):
+        """Return a run of entries, highest first
+
+        Only the entries which are returned are read from the main file
+
+        :param start: The position of the first entry, 0 for the highest
+        :param count: The number of entries to return
+        """
+        in_tail = self.count_tail_before(start)
+        first = start - in_tail
+        main = (self.get_record(i)
+                for i in range(first, min(first + count, self.count)))
+        entries = merge(self.tail_entries()[in_tail:], main,
+                        key=(lambda e: e[1]), reverse=True)
+        return [entry for entry, _ in zip(entries, range(count))]
+
+    def rank(self, score):
+        """Return the position a score would have on the leaderboard
+
+        :param score: The score to find the rank of
+        :returns: 1 for the highest score
+        """
+        in_tail = bisect_left(self.tail, (-score,))
+        return self.count_above(score) + in_tail + 1
+
+    def add(self, name, score):
+        """Add an entry, merging the tail into the main file when it is full
+
+        :param name: Initials of the player
+        :param score: The score that was achieved
+        """
+        self.add_entries([(name, score)])
+
+    def add_entries(self, entries):
+        """Add several entries with a single write to the tail
+
+        :param entries: The entries to add, as pairs of name and score
+        """
+        with open(self.tail_filename, "ab") as file:
+            file.write(b"".join(LeaderboardStore.encode(name, score)
+                                for name, score in entries))
+        for name, score in entries:
+            self.insert_tail(name, score)
+
+        if len(self.tail) > LeaderboardStore.TAIL_LIMIT:
+            self.compact()
+
+    def records(self):
+        """Yield every entry in the main file, reading it in chunks"""
+        size = LeaderboardStore.RECORD.size
+        for start in range(0, self.count, LeaderboardStore.CHUNK):
+            end = min(start + LeaderboardStore.CHUNK, self.count)
+            for name, score in LeaderboardStore.RECORD.iter_unpack(
+                    self.map[start * size:end * size]):
+                yield (LeaderboardStore.decode(name), score)
+
+    def iter_entries(self):
+        """Yield every entry, highest score first"""
+        return merge(self.tail_entries(), self.records(),
+                     key=(lambda e: e[1]), reverse=True)
+
+    @staticmethod
+    def write_entries(filename, entries):
+        """Write entries to a temporary file beside a main file
+
+        :param filename: The main file which the entries are for
+        :param entries: Entries sorted with the highest score first
+        :returns: The temporary file, to be renamed over the main file
+        """
+        temp_filename = f"{filename}.tmp"
+        with open(temp_filename, "wb") as file:
+            for name, score in entries:
+                file.write(LeaderboardStore.encode(name, score))
+        return temp_filename
+
+    def compact(self):
+        """Merge the tail into the main file"""
+        if not self.tail:
+            return
+
+        temp_filename = LeaderboardStore.write_entries(
+            self.filename, self.iter_entries())
+
+        self.close()
+        replace(temp_filename, self.filename)
+        if path.exists(self.tail_filename):
+            remove(self.tail_filename)
+        self.open()
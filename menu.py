@@ -34,18 +34,22 @@ class MenuItem(GameSprite):
 class Menu():
     """Menu object with selectable entries"""
 
-    def __init__(self, game: Game, title) -> None:
+    # number of frames between each blink of the carret
+    BLINK_TIME = 15
+
+    def __init__(self, game: Game, title, states=None) -> None:
         """Initialise the menu object
 
         :param game: The game which this belongs to
         :type game: Game
         :param title: The title of this menu
+        :param states: The game states this menu can be used in
         """
         self.game = game
         self.title = title
         self.padding = 5
 
-        self.game.inputs.add_keypress_handler(self.on_key)
+        self.game.inputs.add_keypress_handler(self.on_key, states)
 
         self.menu_items = []
 
@@ -61,8 +65,7 @@ class Menu():
         self.title.set_pos(position)
 
         self.hidden = True
-
-        self.alpha = 0
+        self.blink_timer = None
 
     def on_key(self, _):
         """Handle Key press events
@@ -138,6 +141,9 @@ class Menu():
             self.title.show()
             self.title.send_to_front()
 
+            self.blink_timer = self.game.ui_timers.schedule(
+                Menu.BLINK_TIME, self.blink, repeat=True)
+
             self.hidden = False
 
     def hide(self):
@@ -149,16 +155,15 @@ class Menu():
 
             self.title.hide()
 
+            self.blink_timer.cancel()
+            self.blink_timer = None
+
             self.hidden = True
 
-    def tick(self):
-        """Update this object"""
-        self.alpha += 1
-        if not self.hidden:
-            if (self.alpha//15) % 2 == 0:
-                self.carret.show()
-            else:
-                self.carret.hide()
+    def blink(self):
+        """Toggle the visibility of the carret"""
+        if self.carret.hidden:
+            self.carret.show()
         else:
             self.carret.hide()
 
@@ -214,14 +219,15 @@ class Menu():
 class KeybindsMenu(Menu):
     """A menu for selecting keybinds on"""
 
-    def __init__(self, game: Game, title):
+    def __init__(self, game: Game, title, states=None):
         """Initialise the menu
 
         :param game: The game which this belongs to
         :type game: Game
         :param title: The title of this menu
+        :param states: The game states this menu can be used in
         """
-        super().__init__(game, title)
+        super().__init__(game, title, states)
         self.key_selecting = ""
 
         image = Font.load_text(game.texture_factory, "press any key")
@@ -251,6 +257,7 @@ class KeybindsMenu(Menu):
         """
         setattr(self.game.inputs.settings, self.key_selecting, key)
         self.game.inputs.settings.save_inputs()
+        self.game.inputs.bind_keys()
         self.key_selecting = ""
         self.edit_item(f"{name}\\s*<.*>", self.get_label(name, key))
 
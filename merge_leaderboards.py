@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+from argparse import ArgumentParser
+from heapq import merge
+from os import replace
+
+from leaderboard import LeaderboardFile
+from leaderboard_store import LeaderboardStore
+
+
+def merge_entries(leaderboards, top=None, dedup=False):
+    """Yield the entries of several leaderboards as one, highest score first
+
+    Each leaderboard is read in order as the merge goes, so only one entry
+    from each is held in memory at a time
+
+    :param leaderboards: The leaderboards to merge
+    :type leaderboards: List[LeaderboardFile]
+    :param top: The most entries to yield, or None for every entry
+    :param dedup: Whether to skip entries with the same name and score as
+                  one which has already been yielded
+    """
+    entries = merge(*(leaderboard.iter_entries()
+                      for leaderboard in leaderboards),
+                    key=(lambda e: e[1]), reverse=True)
+
+    count = 0
+    # names seen with the current score, since duplicates are adjacent
+    current_score = None
+    seen = set()
+
+    for name, score in entries:
+        if top is not None and count >= top:
+            return
+
+        if dedup:
+            if score != current_score:
+                current_score = score
+                seen.clear()
+            if name in seen:
+                continue
+            seen.add(name)
+
+        yield (name, score)
+        count += 1
+
+
+def main():
+    """Merge leaderboard files from several machines into one"""
+    parser = ArgumentParser(
+        description="Merge leaderboard files into a single leaderboard")
+    parser.add_argument("inputs", nargs="+",
+                        help="leaderboard files to merge")
+    parser.add_argument("-o", "--output", required=True,
+                        help="file to write the merged leaderboard to")
+    parser.add_argument("-k", "--top", type=int, default=None,
+                        help="only keep the highest scoring entries")
+    parser.add_argument("-d", "--dedup", action="store_true",
+                        help="drop entries with the same name and score")
+    args = parser.parse_args()
+
+    leaderboards = [LeaderboardFile(filename) for filename in args.inputs]
+    entries = merge_entries(leaderboards, args.top, args.dedup)
+
+    temp_filename = LeaderboardStore.write_entries(args.output, entries)
+    for leaderboard in leaderboards:
+        leaderboard.store.close()
+    replace(temp_filename, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+from array import array
+from math import floor
+from tkinter import NW, PhotoImage
+from typing import List
+
+from config import Config
+
+
+class ParticleSystem:
+    """Pool of short lived animated particles, such as explosions
+
+    Particles are kept in arrays and drawn with a fixed set of canvas items
+    which are reused, so a burst of particles does not create or delete any
+    canvas items.  A particle is only redrawn when it crosses a pixel or its
+    animation moves on to another image
+    """
+
+    def __init__(self, game, images: List[PhotoImage], frame_time=1,
+                 size=Config.PARTICLE_POOL_SIZE) -> None:
+        """Initialise the particle system
+
+        :param game: The game which this belongs to
+        :param images: The images of the particle animation
+        :type images: List[PhotoImage]
+        :param frame_time: Length of each frame of the animation
+        :param size: The most particles that can be shown at once
+        :rtype: None
+        """
+        self.game = game
+        self.canvas = game.canvas
+        self.images = images
+        self.frame_time = frame_time
+        self.lifetime = len(images) * frame_time
+
+        self.xs = array("f", [0] * size)
+        self.ys = array("f", [0] * size)
+        self.velocities_x = array("f", [0] * size)
+        self.velocities_y = array("f", [0] * size)
+        self.ages = array("h", [0] * size)
+        self.frames = array("b", [0] * size)
+        # pixel positions that each canvas item is currently drawn at
+        self.drawn_x = array("h", [0] * size)
+        self.drawn_y = array("h", [0] * size)
+
+        self.items = [
+            self.canvas.create_image(
+                0, 0, anchor=NW, image=images[0], state="hidden")
+            for _ in range(size)
+        ]
+
+        self.free = list(range(size - 1, -1, -1))
+        self.active = []
+
+    def emit(self, position, velocity=(0, 0), age=0):
+        """Start a new particle, if there is a free one in the pool
+
+        :param position: The position to start the particle at
+        :param velocity: Number of pixels to move the particle each frame
+        :param age: Number of frames the particle has already been alive
+        """
+        if not self.free:
+            return
+
+        particle = self.free.pop()
+        x, y = position
+        self.xs[particle], self.ys[particle] = x, y
+        self.velocities_x[particle], self.velocities_y[particle] = velocity
+        frame = age // self.frame_time
+        self.ages[particle] = age
+        self.frames[particle] = frame
+        x, y = floor(x), floor(y)
+        self.drawn_x[particle], self.drawn_y[particle] = x, y
+
+        item = self.items[particle]
+        self.canvas.coords(item, x * Config.SCALE, y * Config.SCALE)
+        self.canvas.itemconfig(item, image=self.images[frame], state="normal")
+        self.canvas.tag_raise(item)
+
+        self.active.append(particle)
+
+    def tick(self):
+        """Move and animate every active particle"""
+        still_active = []
+        for particle in self.active:
+            age = self.ages[particle] + 1
+            item = self.items[particle]
+
+            if age >= self.lifetime:
+                self.canvas.itemconfig(item, state="hidden")
+                self.free.append(particle)
+                continue
+            self.ages[particle] = age
+            still_active.append(particle)
+
+            frame = age // self.frame_time
+            if frame != self.frames[particle]:
+                self.frames[particle] = frame
+                self.canvas.itemconfig(item, image=self.images[frame])
+
+            self.xs[particle] += self.velocities_x[particle]
+            self.ys[particle] += self.velocities_y[particle]
+            x, y = floor(self.xs[particle]), floor(self.ys[particle])
+            if x != self.drawn_x[particle] or y != self.drawn_y[particle]:
+                self.drawn_x[particle], self.drawn_y[particle] = x, y
+                self.canvas.coords(item, x * Config.SCALE, y * Config.SCALE)
+
+        self.active = still_active
+
+    def get_particles(self):
+        """Return the position, velocity and age of every active particle"""
+        return [
+            (self.xs[particle], self.ys[particle],
+             self.velocities_x[particle], self.velocities_y[particle],
+             self.ages[particle])
+            for particle in self.active
+        ]
+
+    def clear(self):
+        """Hide every active particle and return it to the pool"""
+        for particle in self.active:
+            self.canvas.itemconfig(self.items[particle], state="hidden")
+            self.free.append(particle)
+        self.active = []
@@ -0,0 +1,85 @@
+class SceneNode:
+    """A position in the scene graph, relative to a parent node
+
+    The world position of a node is only recalculated after the node or one
+    of its ancestors has moved
+    """
+
+    def __init__(self, position=(0, 0), parent=None) -> None:
+        """Initialise the node
+
+        :param position: The position of the node relative to its parent
+        :param parent: The node which this node moves with
+        :rtype: None
+        """
+        self.local_x, self.local_y = position
+        self.world_x, self.world_y = position
+
+        self.parent = None
+        self.children = []
+
+        # dirty nodes need their world position recalculated
+        self.dirty = True
+        # changed nodes have moved since they were last consumed
+        self.changed = True
+
+        if parent is not None:
+            self.set_parent(parent)
+
+    def set_parent(self, parent):
+        """Attach this node to a new parent
+
+        :param parent: The new parent node, or None to detach this node
+        """
+        if self.parent is not None:
+            self.parent.children.remove(self)
+
+        self.parent = parent
+        if parent is not None:
+            parent.children.append(self)
+
+        self.mark_dirty()
+
+    def set_position(self, pos):
+        """Set the position of this node relative to its parent
+
+        :param pos: position to move to
+        """
+        x, y = pos
+        if x != self.local_x or y != self.local_y:
+            self.local_x, self.local_y = x, y
+            self.mark_dirty()
+
+    def get_position(self):
+        """Return the position of this node relative to its parent"""
+        return (self.local_x, self.local_y)
+
+    def mark_dirty(self):
+        """Flag this node and all of its descendants for recalculation"""
+        if not self.dirty:
+            self.dirty = True
+            for child in self.children:
+                child.mark_dirty()
+
+    def get_world_position(self):
+        """Return the absolute position of this node"""
+        if self.dirty:
+            x, y = self.local_x, self.local_y
+            if self.parent is not None:
+                parent_x, parent_y = self.parent.get_world_position()
+                x += parent_x
+                y += parent_y
+
+            if x != self.world_x or y != self.world_y:
+                self.world_x, self.world_y = x, y
+                self.changed = True
+            self.dirty = False
+
+        return (self.world_x, self.world_y)
+
+    def consume_change(self):
+        """Return True if this node has moved since this was last called"""
+        self.get_world_position()
+        changed = self.changed
+        self.changed = False
+        return changed
@@ -17,6 +17,7 @@ class Lazer(GameSprite):
         :param color: name of the colour of the lazer
         """
         self.velocity = velocity
+        self.color = color
         self.game = game
         super().__init__(game, game.texture_factory.get_image(
             f"lazer:{color}"))
@@ -55,15 +56,36 @@ class Shooter(DamageableSprite):
         super().__init__(game, image_name, hp=attributes.hp)
         self.lazers: List[Lazer] = []
         self.attributes = attributes
-        self.last_shot = self.game.alpha
+
+        self.loaded = False
+        self.reload_timer = None
+        self.reload()
+
+    def reload(self, delay=None):
+        """Start waiting for the cooldown before the next shot
+
+        :param delay: Number of ticks to wait, defaults to the cooldown
+        """
+        if self.reload_timer is not None:
+            self.reload_timer.cancel()
+            self.reload_timer = None
+
+        self.loaded = False
+        if self.attributes.cooldown != -1:
+            if delay is None:
+                delay = self.attributes.cooldown + 1
+            self.reload_timer = self.game.timers.schedule(
+                delay, self.on_reloaded)
+
+    def on_reloaded(self):
+        """Called when the cooldown is over"""
+        self.reload_timer = None
+        self.loaded = True
 
     def shoot(self):
         """Soot a lazer if possible"""
-        next_shot = self.last_shot + self.attributes.cooldown
-
-        if not self.destroyed \
-                and self.game.alpha > next_shot:
-            self.last_shot = self.game.alpha
+        if not self.destroyed and self.loaded:
+            self.reload()
 
             lazer = Lazer(self.game,
                           velocity=self.attributes.velocity,
@@ -84,5 +106,7 @@ class Shooter(DamageableSprite):
     def destroy(self):
         """Remove all the associated objects"""
         super().destroy()
+        if self.reload_timer is not None:
+            self.reload_timer.cancel()
         for lazer in self.lazers:
             self.game.sprites.append(lazer)
@@ -1,7 +1,8 @@
 from enum import Enum, auto
-from os import path, remove
-from random import random
+from os import path
+from sys import stderr
 
+from autosave import AutosaveRing
 from boss_key import BossKey
 from cheat_engine import Cheat, CheatEngine, DevModeCheat, InvincibilityCheat
 from config import Config
@@ -11,6 +12,8 @@ from hud import GameHud
 from leaderboard import Leaderboard
 from menu import KeybindsMenu, Menu
 from shooter import Shooter, ShooterAttributes
+from snapshot import GameSnapshot
+from spawn_director import SpawnDirector
 from textures import Textures
 
 
@@ -34,15 +37,9 @@ class GameSave:
 
         :param game: Game to save
         """
-
-        phase = int.to_bytes(game.formation_spawner.phase, 2, "big")
-        hp = int.to_bytes(game.player.hp, 1, "big")
-        score = int.to_bytes(game.score, 8, "big")
-
-        with open(Config.SAVE_FILE, "wb") as file:
-            file.write(phase)
-            file.write(hp)
-            file.write(score)
+        game.writer.replace_file(Config.SAVE_FILE, GameSnapshot.save(game))
+        # so that the newest autosave is never older than the save
+        game.autosave.save()
 
         if not game.menu.has_item("Continue"):
             game.menu.add_item("Continue", game.restore_game, index=0)
@@ -52,11 +49,31 @@ class GameSave:
         """load game state from file
 
         :param game: Game to load
+        :returns: True if the game was restored exactly, or False if only
+                  the phase, hp and score were loaded and the phase needs
+                  to be started
         """
-        with open(Config.SAVE_FILE, "rb") as file:
-            game.formation_spawner.phase = int.from_bytes(file.read(2), "big")
-            game.player.hp = int.from_bytes(file.read(1), "big")
-            game.score = int.from_bytes(file.read(8), "big")
+        game.writer.flush()
+        try:
+            with open(Config.SAVE_FILE, "rb") as file:
+                data = file.read()
+        except OSError as error:
+            print(f"Failed to load save: {error}", file=stderr)
+            return False
+
+        if data.startswith(GameSnapshot.MAGIC):
+            try:
+                GameSnapshot.load(game, data)
+                return True
+            except ValueError as error:
+                print(f"Failed to load save: {error}", file=stderr)
+                return False
+
+        # saves from before snapshots only hold the phase, hp and score
+        game.formation_spawner.phase = int.from_bytes(data[0:2], "big")
+        game.player.hp = int.from_bytes(data[2:3], "big")
+        game.score = int.from_bytes(data[3:11], "big")
+        return False
 
     @staticmethod
     def remove_save(game):
@@ -64,10 +81,10 @@ class GameSave:
 
         :param game:
         """
-        if path.exists(Config.SAVE_FILE):
-            remove(Config.SAVE_FILE)
-            if game.menu.has_item("Continue"):
-                game.menu.del_item("Continue")
+        game.writer.replace_file(Config.SAVE_FILE, None)
+        game.autosave.clear()
+        if game.menu.has_item("Continue"):
+            game.menu.del_item("Continue")
 
 
 class Player(Shooter):
@@ -92,6 +109,9 @@ class Player(Shooter):
     def tick(self):
         """Update this object"""
         super().tick()
+        position = self.get_pos()
+        loaded = self.loaded
+
         if self.game.inputs.k_left:
             self.move(-1, 0)
         if self.game.inputs.k_right:
@@ -114,6 +134,9 @@ class Player(Shooter):
         if self.game.inputs.k_action:
             self.shoot()
 
+        if self.get_pos() != position or (loaded and not self.loaded):
+            self.game.inputs.respond()
+
 
 class ShooterGame(Game):
     """Game with menus and enemies to be shot at """
@@ -124,8 +147,21 @@ class ShooterGame(Game):
 
         self.state = GameState.MAIN_MENU
         self.death_time = -1
+
+        # only game play needs the full frame rate
+        self.frame_counter.rates = {
+            state: Config.IDLE_FPS for state in (
+                GameState.MAIN_MENU,
+                GameState.PAUSED,
+                GameState.SETTINGS,
+                GameState.LEADERBOARD,
+            )
+        }
         self.paused_frame = 0
 
+        self.autosave = AutosaveRing(self)
+        self.last_autosave = 0
+
         # load textures
         Textures.load_textures(self.texture_factory)
         self.effect_player.load_textures()
@@ -134,6 +170,7 @@ class ShooterGame(Game):
         self.state = GameState.MAIN_MENU
 
         self.formation_spawner = FormationSpawner(self)
+        self.spawn_director = SpawnDirector(self)
 
         self.player = Player(self)
 
@@ -141,11 +178,15 @@ class ShooterGame(Game):
         self.game_hud = GameHud(self)
 
         # create the leaderboard sprites
-        self.leaderboard = Leaderboard(self)
+        self.leaderboard = Leaderboard(
+            self,
+            (GameState.LEADERBOARD, GameState.END_LEADERBOARD),
+            (GameState.END_LEADERBOARD,))
         self.leaderboard.callback = self.show_menu
 
         # make the settings menu
-        self.settings_menu = KeybindsMenu(self, "Keybinds")
+        self.settings_menu = KeybindsMenu(
+            self, "Keybinds", (GameState.SETTINGS,))
         for name, value in vars(self.inputs.settings).items():
             label = self.settings_menu.get_label(name, value)
             self.settings_menu.add_item(
@@ -155,8 +196,8 @@ class ShooterGame(Game):
         self.settings_menu.add_item("Return", self.show_menu)
 
         # make the main menu
-        self.menu = Menu(self, "Main Menu")
-        if path.exists(Config.SAVE_FILE):
+        self.menu = Menu(self, "Main Menu", (GameState.MAIN_MENU,))
+        if path.exists(Config.SAVE_FILE) or self.autosave.exists():
             self.menu.add_item("Continue", self.restore_game)
         self.menu.add_item("New Game", self.start_game)
         self.menu.add_item("Leaderboard", self.show_leaderboard)
@@ -164,7 +205,7 @@ class ShooterGame(Game):
         self.menu.show()
 
         # make the pause menu
-        self.pause_menu = Menu(self, "Game Paused")
+        self.pause_menu = Menu(self, "Game Paused", (GameState.PAUSED,))
         self.pause_menu.add_item("Resume", self.resume_game)
 
         self.pause_menu.add_item("Save", lambda: (
@@ -219,23 +260,21 @@ class ShooterGame(Game):
 
         self.boss_key = BossKey(self, self.pause_game)
 
+    def close(self):
+        """Finish writing anything that still needs saving"""
+        self.leaderboard.close()
+        super().close()
+
     def tick(self):
         """Update the game state"""
         if self.state != GameState.PAUSED:
             super().tick()
+            self.spawn_director.tick()
 
-            if random() > 0.9:
-                self.effect_player.create_star()
-
-        if self.state == GameState.MAIN_MENU:
-            self.menu.tick()
-        elif self.state == GameState.SETTINGS:
-            self.settings_menu.tick()
-        elif self.state == GameState.GAME:
+        if self.state == GameState.GAME:
             self.tick_game()
         elif self.state == GameState.PAUSED:
             self.alpha = self.paused_frame
-            self.pause_menu.tick()
         elif self.state == GameState.END_LEADERBOARD:
             self.leaderboard.tick()
         elif self.state == GameState.LEADERBOARD:
@@ -247,6 +286,12 @@ class ShooterGame(Game):
         self.formation_spawner.tick()
         self.player.tick()
 
+        autosave_due = self.alpha - self.last_autosave \
+            >= Config.AUTOSAVE_INTERVAL
+        if autosave_due and not self.player.destroyed:
+            self.last_autosave = self.alpha
+            self.autosave.save()
+
         if self.player.destroyed:
             if self.death_time == -1:
                 self.death_time = self.alpha
@@ -286,6 +331,7 @@ class ShooterGame(Game):
         self.player = Player(self)
 
         self.formation_spawner.next_phase()
+        self.last_autosave = self.alpha
 
         self.player.show()
         self.game_hud.show()
@@ -299,6 +345,7 @@ class ShooterGame(Game):
         self.menu.hide()
         self.pause_menu.hide()
         self.leaderboard.editing = False
+        self.leaderboard.scroll = 0
         self.leaderboard.populate_entries()
         self.leaderboard.start_animation()
 
@@ -311,6 +358,7 @@ class ShooterGame(Game):
         self.clear_all()
         self.game_hud.hide()
         self.leaderboard.editing = True
+        self.leaderboard.scroll = 0
         self.leaderboard.populate_entries()
         self.leaderboard.start_animation()
         self.leaderboard.show()
@@ -345,9 +393,10 @@ class ShooterGame(Game):
         self.player = Player(self)
         self.death_time = -1
 
-        GameSave.load_game(self)
-
-        self.formation_spawner.start_phase()
+        # autosaves are at least as new as the save, so they are tried first
+        if not self.autosave.restore() and not GameSave.load_game(self):
+            self.formation_spawner.start_phase()
+        self.last_autosave = self.alpha
         self.game_hud.show()
         self.player.show()
 
@@ -0,0 +1,622 @@
+import random
+from dataclasses import fields, replace
+from struct import Struct, error as StructError
+
+from boss import CircleBossFormation, SnakeBossFormation
+from formation import (
+    CircleFormation,
+    CircleFormationAttributes,
+    EnemyFormation,
+    FormationAttributes,
+    FormationEnemy,
+    LemniscateFormation,
+    RectangleFormation,
+    RectangleFormationAttributes,
+    TriangleFormation,
+    TriangleFormationAttributes,
+)
+from formation_spawner import (
+    figure_of_eight_pattern,
+    no_pattern,
+    slide_in_pattern,
+    slow_pattern,
+    speed_pattern,
+    wobble_pattern,
+)
+from shooter import Lazer
+from timer_wheel import TimerWheel
+
+
+class SnapshotWriter:
+    """Builds a snapshot by appending packed fields to a buffer"""
+
+    def __init__(self) -> None:
+        """Initialise the writer
+
+        :rtype: None
+        """
+        self.buffer = bytearray()
+        # offsets at which each section after the first starts
+        self.sections = []
+
+    def start_section(self):
+        """Start a new section of the snapshot
+
+        A section holds a part of the game whose size can change, so that
+        anything comparing snapshots can line up the parts which follow it
+        """
+        self.sections.append(len(self.buffer))
+
+    def get_sections(self):
+        """Return the snapshot split into its sections"""
+        bounds = [0] + self.sections + [len(self.buffer)]
+        return [bytes(self.buffer[start:end])
+                for start, end in zip(bounds, bounds[1:])]
+
+    def pack(self, fmt: Struct, *values):
+        """Append values packed with a struct
+
+        :param fmt: The struct to pack the values with
+        :type fmt: Struct
+        """
+        self.buffer += fmt.pack(*values)
+
+    def write_string(self, text):
+        """Append a short string, prefixed by its length
+
+        :param text: The string to append
+        """
+        data = text.encode("ascii")
+        self.buffer += GameSnapshot.COUNT.pack(len(data))
+        self.buffer += data
+
+
+class SnapshotReader:
+    """Reads the fields of a snapshot in the order they were written"""
+
+    def __init__(self, data) -> None:
+        """Initialise the reader
+
+        :param data: The snapshot to read
+        :rtype: None
+        """
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, fmt: Struct):
+        """Read values packed with a struct
+
+        :param fmt: The struct the values were packed with
+        :type fmt: Struct
+        """
+        values = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def read_string(self):
+        """Read a string written by SnapshotWriter.write_string"""
+        length, = self.unpack(GameSnapshot.COUNT)
+        text = bytes(self.data[self.offset:self.offset + length])
+        self.offset += length
+        return text.decode("ascii")
+
+
+class GameSnapshot:
+    """Static class which saves and restores the whole state of a game
+
+    A snapshot is a versioned binary record of everything needed to carry
+    on from the exact frame it was taken at: the spawner and its planned
+    waves, every formation and enemy, every lazer, the player, the random
+    number generator and optionally the explosion particles
+    """
+
+    MAGIC = b"SHSN"
+    # increased whenever the layout of a snapshot changes
+    VERSION = 1
+    # set in the header flags when the particles have been saved
+    EFFECTS = 1
+
+    HEADER = Struct("<4sHB")
+    COUNT = Struct("<H")
+    # alpha, score
+    GAME = Struct("<IQ")
+    # phase, formations left to spawn, wave, frame of the next formation
+    SPAWNER = Struct("<hdHd")
+    # earliest frame, create function
+    WAVE = Struct("<qB")
+    # kind, movement pattern, x, y, alpha
+    FORMATION = Struct("<BBddq")
+    # attribute class, hidden, built, positioned, origin x and y
+    FORMATION_STATE = Struct("<BBBBii")
+    # snake phase, phase timer, length, alpha of the head's history
+    SNAKE = Struct("<BqHq")
+    # offset x, y and a, x, y, hp, cooldown, ticks until reloaded
+    ENEMY = Struct("<dddddiii")
+    # x, y, hp, ticks until reloaded
+    PLAYER = Struct("<ddii")
+    # x, y, velocity
+    LAZER = Struct("<ddb")
+    # x, y, velocity x, velocity y, age
+    PARTICLE = Struct("<ffffh")
+    # an integer field of a formation's attributes
+    ATTRIBUTE = Struct("<q")
+    # number of formations, whether the last one is waiting to be spawned
+    FORMATIONS_HEADER = Struct("<HB")
+    # alpha of the ring of minions around the circle boss
+    RING = Struct("<q")
+    # version, has a gaussian been saved, next gaussian
+    RANDOM = Struct("<BBd")
+    RANDOM_STATE = Struct("<625I")
+
+    # formations are stored by their index in these tables, so new entries
+    # must only be added at the end
+    FORMATIONS = (
+        TriangleFormation,
+        CircleFormation,
+        LemniscateFormation,
+        RectangleFormation,
+        CircleBossFormation,
+        SnakeBossFormation,
+    )
+    ATTRIBUTES = (
+        FormationAttributes,
+        TriangleFormationAttributes,
+        CircleFormationAttributes,
+        RectangleFormationAttributes,
+    )
+    PATTERNS = (
+        wobble_pattern,
+        speed_pattern,
+        slow_pattern,
+        slide_in_pattern,
+        no_pattern,
+        figure_of_eight_pattern,
+    )
+    CREATE_FUNCTIONS = (
+        "create_fleet",
+        "create_loop",
+        "create_orbital",
+        "create_rectangle",
+        "create_circle_boss",
+        "create_snake_boss",
+    )
+
+    @staticmethod
+    def save(game, effects=False):
+        """Return a snapshot of a game
+
+        :param game: The game to take a snapshot of
+        :param effects: Whether to include the explosion particles
+        """
+        return b"".join(GameSnapshot.save_sections(game, effects))
+
+    @staticmethod
+    def save_sections(game, effects=False):
+        """Return a snapshot of a game, split into sections which each hold
+        a part of the game whose size can change, such as a formation or a
+        list of lazers
+
+        :param game: The game to take a snapshot of
+        :param effects: Whether to include the explosion particles
+        """
+        writer = SnapshotWriter()
+        flags = GameSnapshot.EFFECTS if effects else 0
+        writer.pack(GameSnapshot.HEADER, GameSnapshot.MAGIC,
+                    GameSnapshot.VERSION, flags)
+        writer.pack(GameSnapshot.GAME, game.alpha, game.score)
+
+        GameSnapshot.write_random(writer)
+        writer.start_section()
+        GameSnapshot.write_spawner(writer, game)
+
+        writer.start_section()
+        player = game.player
+        writer.pack(GameSnapshot.PLAYER, player.x, player.y, player.hp,
+                    GameSnapshot.get_reload(player))
+        GameSnapshot.write_lazers(writer, player.lazers)
+
+        # lazers left behind by destroyed enemies
+        writer.start_section()
+        GameSnapshot.write_lazers(
+            writer, [s for s in game.sprites if isinstance(s, Lazer)])
+
+        if effects:
+            writer.start_section()
+            particles = game.effect_player.explosions.get_particles()
+            writer.pack(GameSnapshot.COUNT, len(particles))
+            for particle in particles:
+                writer.pack(GameSnapshot.PARTICLE, *particle)
+
+        return writer.get_sections()
+
+    @staticmethod
+    def load(game, data):
+        """Replace the state of a game with a snapshot
+
+        :param game: The game to restore
+        :param data: A snapshot returned by save
+        :raises ValueError: If the data is not a snapshot this can read
+        """
+        reader = SnapshotReader(data)
+        try:
+            GameSnapshot.read_game(reader, game)
+        except StructError as error:
+            raise ValueError("snapshot is truncated") from error
+
+    @staticmethod
+    def read_game(reader, game):
+        """Read a whole snapshot into a game
+
+        :param reader: The snapshot being read
+        :param game: The game to restore
+        """
+        magic, version, flags = reader.unpack(GameSnapshot.HEADER)
+        if magic != GameSnapshot.MAGIC:
+            raise ValueError("not a game snapshot")
+        if version != GameSnapshot.VERSION:
+            raise ValueError(f"unsupported snapshot version {version}")
+
+        alpha, game.score = reader.unpack(GameSnapshot.GAME)
+        random_state = GameSnapshot.read_random(reader)
+
+        # timers belong to the objects being replaced, so start afresh
+        spawner = game.formation_spawner
+        spawner.clear_all()
+        spawner.formations = []
+        for sprite in game.sprites:
+            sprite.destroy()
+        for sprite in game.effect_player.sprites:
+            sprite.destroy()
+        game.effect_player.explosions.clear()
+
+        game.alpha = alpha
+        game.timers = TimerWheel(alpha)
+        game.spawn_director.last_decision = alpha
+
+        GameSnapshot.read_spawner(reader, game)
+
+        player = game.player
+        x, y, player.hp, reload = reader.unpack(GameSnapshot.PLAYER)
+        player.set_pos((x, y))
+        GameSnapshot.set_reload(player, reload)
+        player.lazers = GameSnapshot.read_lazers(reader, game)
+        game.sprites = GameSnapshot.read_lazers(reader, game)
+
+        if flags & GameSnapshot.EFFECTS:
+            count, = reader.unpack(GameSnapshot.COUNT)
+            for _ in range(count):
+                x, y, velocity_x, velocity_y, age = reader.unpack(
+                    GameSnapshot.PARTICLE)
+                game.effect_player.explosions.emit(
+                    (x, y), (velocity_x, velocity_y), age)
+
+        random.setstate(random_state)
+
+    @staticmethod
+    def write_random(writer):
+        """Write the state of the random number generator
+
+        :param writer: The snapshot being written
+        """
+        version, state, gauss = random.getstate()
+        writer.pack(GameSnapshot.RANDOM, version, gauss is not None,
+                    gauss or 0)
+        writer.pack(GameSnapshot.RANDOM_STATE, *state)
+
+    @staticmethod
+    def read_random(reader):
+        """Read a state of the random number generator
+
+        :param reader: The snapshot being read
+        """
+        version, has_gauss, gauss = reader.unpack(GameSnapshot.RANDOM)
+        state = reader.unpack(GameSnapshot.RANDOM_STATE)
+        return (version, state, gauss if has_gauss else None)
+
+    @staticmethod
+    def write_spawner(writer, game):
+        """Write the formation spawner and every formation
+
+        :param writer: The snapshot being written
+        :param game: The game being saved
+        """
+        spawner = game.formation_spawner
+        writer.pack(GameSnapshot.SPAWNER, spawner.phase, spawner.to_spawn,
+                    spawner.wave, spawner.next_formation)
+
+        waves = spawner.current_phase().waves
+        writer.pack(GameSnapshot.COUNT, len(waves))
+        for frame, create in waves:
+            writer.pack(GameSnapshot.WAVE, frame,
+                        GameSnapshot.CREATE_FUNCTIONS.index(create.__name__))
+
+        formations = list(spawner.formations)
+        if spawner.prepared is not None:
+            formations.append(spawner.prepared)
+        writer.pack(GameSnapshot.FORMATIONS_HEADER, len(formations),
+                    spawner.prepared is not None)
+        for formation, update in formations:
+            writer.start_section()
+            GameSnapshot.write_formation(writer, formation, update)
+
+    @staticmethod
+    def read_spawner(reader, game):
+        """Read the formation spawner and every formation
+
+        :param reader: The snapshot being read
+        :param game: The game being restored
+        """
+        spawner = game.formation_spawner
+        spawner.phase, spawner.to_spawn, spawner.wave, \
+            spawner.next_formation = reader.unpack(GameSnapshot.SPAWNER)
+        if spawner.phase < 0:
+            raise ValueError(f"snapshot has invalid phase {spawner.phase}")
+
+        spawner.difficulty_multiplier = spawner.get_difficulty(spawner.phase)
+        spawner.current_reward = int(2**spawner.difficulty_multiplier)
+
+        count, = reader.unpack(GameSnapshot.COUNT)
+        waves = []
+        for _ in range(count):
+            frame, create = reader.unpack(GameSnapshot.WAVE)
+            waves.append((frame, getattr(
+                spawner, GameSnapshot.CREATE_FUNCTIONS[create])))
+        spawner.current_phase().waves = waves
+
+        count, prepared = reader.unpack(GameSnapshot.FORMATIONS_HEADER)
+        formations = [
+            GameSnapshot.read_formation(reader, game) for _ in range(count)
+        ]
+        if prepared:
+            spawner.prepared = formations.pop()
+        spawner.formations = formations
+
+    @staticmethod
+    def write_formation(writer, formation, update):
+        """Write a formation and its enemies
+
+        :param writer: The snapshot being written
+        :param formation: The formation to write
+        :param update: The movement function of the formation
+        """
+        x, y = formation.node.local_x, formation.node.local_y
+        writer.pack(GameSnapshot.FORMATION,
+                    GameSnapshot.FORMATIONS.index(type(formation)),
+                    GameSnapshot.PATTERNS.index(update),
+                    x, y, formation.alpha)
+        writer.write_string(formation.image_name)
+
+        if isinstance(formation, SnakeBossFormation):
+            history_alpha = formation.history_alpha
+            writer.pack(GameSnapshot.SNAKE, formation.phase,
+                        formation.phase_timer, formation.length,
+                        -1 if history_alpha is None else history_alpha)
+            # the path depends on the phase timer when it was recorded, so
+            # it can't be recalculated afterwards
+            writer.pack(Struct(f"<{2*formation.history_size}d"),
+                        *(value for point in formation.history
+                          for value in point))
+
+        GameSnapshot.write_members(writer, formation)
+        if isinstance(formation, CircleBossFormation):
+            ring = formation.circle_formation
+            writer.pack(GameSnapshot.RING, ring.alpha)
+            GameSnapshot.write_members(writer, ring)
+
+    @staticmethod
+    def read_formation(reader, game):
+        """Read a formation and its enemies
+
+        :param reader: The snapshot being read
+        :param game: The game being restored
+        :returns: The formation and its movement function
+        """
+        kind, pattern, x, y, alpha = reader.unpack(GameSnapshot.FORMATION)
+        image_name = reader.read_string()
+        formation_type = GameSnapshot.FORMATIONS[kind]
+
+        if formation_type is SnakeBossFormation:
+            phase, phase_timer, length, history_alpha = reader.unpack(
+                GameSnapshot.SNAKE)
+            formation = SnakeBossFormation(
+                game, FormationAttributes(), length)
+            formation.phase, formation.phase_timer = phase, phase_timer
+
+            history = reader.unpack(
+                Struct(f"<{2*formation.history_size}d"))
+            formation.history = list(zip(history[0::2], history[1::2]))
+            if history_alpha != -1:
+                formation.history_alpha = history_alpha
+        elif formation_type is CircleBossFormation:
+            formation = CircleBossFormation(game, FormationAttributes())
+        else:
+            formation = formation_type(
+                game, image_name, FormationAttributes())
+
+        formation.set_pos((x, y))
+        formation.alpha = alpha
+        GameSnapshot.read_members(reader, formation)
+
+        if isinstance(formation, CircleBossFormation):
+            ring = formation.circle_formation
+            ring.alpha, = reader.unpack(GameSnapshot.RING)
+            GameSnapshot.read_members(reader, ring)
+
+        if isinstance(formation, SnakeBossFormation) \
+                and formation.builder is None:
+            formation.head = GameSnapshot.find_member(
+                formation, formation.head_name, 0)
+            formation.tail = GameSnapshot.find_member(
+                formation, formation.tail_name, formation.length+1)
+
+        return formation, GameSnapshot.PATTERNS[pattern]
+
+    @staticmethod
+    def write_members(writer, formation):
+        """Write the attributes and enemies of a formation
+
+        Enemies are only written once the formation has been built, since
+        building it again gives the same enemies
+
+        :param writer: The snapshot being written
+        :param formation: The formation to write
+        """
+        attributes = formation.attributes
+        built = formation.builder is None
+        writer.pack(GameSnapshot.FORMATION_STATE,
+                    GameSnapshot.ATTRIBUTES.index(type(attributes)),
+                    formation.hidden, built, formation.bounds is not None,
+                    formation.origin_x, formation.origin_y)
+        for field in fields(attributes):
+            value = getattr(attributes, field.name)
+            if isinstance(value, str):
+                writer.write_string(value)
+            else:
+                writer.pack(GameSnapshot.ATTRIBUTE, value)
+
+        if not built:
+            return
+        writer.pack(GameSnapshot.COUNT, len(formation.sprites))
+        for enemy in formation.sprites:
+            writer.write_string(enemy.image_name)
+            writer.pack(GameSnapshot.ENEMY, enemy.offset_x, enemy.offset_y,
+                        enemy.offset_a, enemy.x, enemy.y, enemy.hp,
+                        enemy.attributes.cooldown,
+                        GameSnapshot.get_reload(enemy))
+            GameSnapshot.write_lazers(writer, enemy.lazers)
+
+    @staticmethod
+    def read_members(reader, formation: EnemyFormation):
+        """Read the attributes and enemies of a formation
+
+        :param reader: The snapshot being read
+        :param formation: The newly created formation to fill
+        :type formation: EnemyFormation
+        """
+        game = formation.game
+        kind, hidden, built, positioned, origin_x, origin_y = reader.unpack(
+            GameSnapshot.FORMATION_STATE)
+
+        values = {}
+        for field in fields(GameSnapshot.ATTRIBUTES[kind]):
+            if field.type is str:
+                values[field.name] = reader.read_string()
+            else:
+                values[field.name], = reader.unpack(GameSnapshot.ATTRIBUTE)
+        formation.attributes = GameSnapshot.ATTRIBUTES[kind](**values)
+
+        if not built:
+            return
+        formation.builder = None
+        # enemies are put back where they were drawn, which is a frame
+        # behind the formation until it is next positioned
+        formation.origin_x, formation.origin_y = origin_x, origin_y
+        formation.drawn_x, formation.drawn_y = origin_x, origin_y
+
+        count, = reader.unpack(GameSnapshot.COUNT)
+        for _ in range(count):
+            image_name = reader.read_string()
+            offset_x, offset_y, offset_a, x, y, hp, cooldown, reload = \
+                reader.unpack(GameSnapshot.ENEMY)
+
+            # some formations index tables with offsets that are whole numbers
+            offset = tuple(int(value) if value.is_integer() else value
+                           for value in (offset_x, offset_y, offset_a))
+            enemy = FormationEnemy(
+                game, image_name, offset,
+                replace(formation.attributes, cooldown=cooldown))
+            enemy.hp = hp
+            formation.sprites.append(enemy)
+            if formation.rigid:
+                formation.attach_enemy(enemy)
+            else:
+                enemy.set_pos((x, y))
+
+            if not hidden:
+                enemy.show()
+            GameSnapshot.set_reload(enemy, reload)
+            enemy.lazers = GameSnapshot.read_lazers(reader, game)
+
+        formation.hidden = bool(hidden)
+        if positioned and formation.sprites:
+            formation.update_bounds(
+                [(enemy.x, enemy.y) for enemy in formation.sprites])
+
+    @staticmethod
+    def find_member(formation, image_name, offset_a):
+        """Find an enemy of a formation by its place in the formation
+
+        An enemy which has already been destroyed is recreated as destroyed,
+        since the formation may still check whether it is alive
+
+        :param formation: The formation to search
+        :param image_name: The image of the enemy
+        :param offset_a: The offset_a of the enemy
+        """
+        for enemy in formation.sprites:
+            if enemy.offset_a == offset_a and enemy.image_name == image_name:
+                return enemy
+
+        enemy = FormationEnemy(formation.game, image_name, (0, 0, offset_a),
+                               replace(formation.attributes))
+        enemy.destroy()
+        return enemy
+
+    @staticmethod
+    def write_lazers(writer, lazers):
+        """Write a list of lazers
+
+        :param writer: The snapshot being written
+        :param lazers: The lazers to write
+        """
+        lazers = [lazer for lazer in lazers if not lazer.destroyed]
+        writer.pack(GameSnapshot.COUNT, len(lazers))
+        for lazer in lazers:
+            writer.pack(GameSnapshot.LAZER, lazer.x, lazer.y, lazer.velocity)
+            writer.write_string(lazer.color)
+
+    @staticmethod
+    def read_lazers(reader, game):
+        """Read a list of lazers and show them
+
+        :param reader: The snapshot being read
+        :param game: The game being restored
+        """
+        count, = reader.unpack(GameSnapshot.COUNT)
+        lazers = []
+        for _ in range(count):
+            x, y, velocity = reader.unpack(GameSnapshot.LAZER)
+            lazer = Lazer(game, velocity, reader.read_string())
+            lazer.set_pos((x, y))
+            lazer.show()
+            lazers.append(lazer)
+        return lazers
+
+    @staticmethod
+    def get_reload(shooter):
+        """Return the number of ticks until a shooter is loaded
+
+        :param shooter: The shooter to check
+        :returns: 0 if it is loaded, or -1 if it never reloads
+        """
+        if shooter.loaded:
+            return 0
+        if shooter.reload_timer is None:
+            return -1
+        return max(1, shooter.reload_timer.due - shooter.game.timers.tick)
+
+    @staticmethod
+    def set_reload(shooter, reload):
+        """Restore how long a shooter has left until it is loaded
+
+        :param shooter: The shooter to restore
+        :param reload: A value returned by get_reload
+        """
+        if shooter.reload_timer is not None:
+            shooter.reload_timer.cancel()
+            shooter.reload_timer = None
+
+        if reload > 0:
+            shooter.reload(reload)
+        else:
+            shooter.loaded = reload == 0
@@ -0,0 +1,58 @@
+from sys import stderr
+
+from config import Config
+
+
+class SpawnDirector:
+    """Object which scales back spawning and effects to fit a frame budget
+
+    The director watches the time spent on recent frames, and raises or
+    lowers a throttle level to keep the 95th percentile within the target
+    """
+
+    MAX_LEVEL = 3
+    # number of frames between each decision
+    INTERVAL = 30
+    # fraction of the target that frames must be under before easing off
+    RECOVERY = 0.6
+
+    def __init__(self, game, target=Config.FRAME_BUDGET) -> None:
+        """Initialise the spawn director
+
+        :param game: The game which this belongs to
+        :param target: The 95th percentile frame time to aim for, in seconds
+        :rtype: None
+        """
+        self.game = game
+        self.target = target
+        self.level = 0
+        self.last_decision = game.alpha
+
+    def tick(self):
+        """Decide whether to change the throttle level"""
+        if self.game.alpha - self.last_decision < SpawnDirector.INTERVAL:
+            return
+        self.last_decision = self.game.alpha
+
+        p95 = self.game.frame_counter.work_time_percentile(95)
+
+        if p95 > self.target and self.level < SpawnDirector.MAX_LEVEL:
+            self.set_level(self.level + 1, p95)
+        elif p95 < self.target * SpawnDirector.RECOVERY and self.level > 0:
+            self.set_level(self.level - 1, p95)
+
+    def set_level(self, level, p95):
+        """Apply a throttle level to spawning and effects
+
+        :param level: The new level, 0 for no throttling
+        :param p95: The frame time percentile that caused the change
+        """
+        print(
+            f"Spawn director: p95 frame time {p95*1000:.1f}ms "
+            f"(target {self.target*1000:.1f}ms), "
+            f"throttle level {self.level} -> {level}",
+            file=stderr)
+
+        self.level = level
+        self.game.formation_spawner.throttle = level
+        self.game.effect_player.detail = 1 - level / SpawnDirector.MAX_LEVEL
@@ -15,6 +15,22 @@ class Sprite:
         """
         return list(filter(lambda s: not s.destroyed, sprite_list))
 
+    @staticmethod
+    def set_positions(sprite_list, positions, redraw=False):
+        """Move a list of sprites to a list of positions as one batch
+
+        Sprites which are already at their position are not redrawn
+
+        :param sprite_list:
+        :type sprite_list: list[Sprite]
+        :param positions: a position for each sprite in the list
+        :param redraw: Whether to redraw sprites that have not moved
+        """
+        for sprite, (x, y) in zip(sprite_list, positions):
+            if redraw or sprite.x != x or sprite.y != y:
+                sprite.x, sprite.y = x, y
+                sprite.update_position()
+
     def __init__(self, canvas: Canvas, image: PhotoImage, position=(0, 0)):
         """Initialise the sprite class
 
@@ -37,6 +53,7 @@ class Sprite:
         self.h = image.height() // Config.SCALE
 
         self.destroyed = False
+        self.hidden = True
         self.hide()
 
     def update_position(self):
@@ -115,13 +132,15 @@ class Sprite:
     def show(self):
         """Set the sprite to be shown"""
         self.canvas.itemconfig(self.canvas_image, state="normal")
+        self.hidden = False
         return self
 
     def hide(self):
         """Set the sprite to be hidden"""
         self.canvas.itemconfig(self.canvas_image, state="hidden")
+        self.hidden = True
         return self
 
     def is_hidden(self):
         """Return True if the sprite is hidden"""
-        return self.canvas.itemcget(self.canvas_image, "state") == "hidden"
+        return self.hidden
@@ -0,0 +1,117 @@
+from array import array
+from collections import deque
+from random import Random
+from tkinter import NW, PhotoImage
+
+from config import Config
+
+
+class Starfield:
+    """Scrolling background of stars with parallax layers
+
+    Stars are kept in arrays rather than as sprites.  Each layer scrolls all
+    of its stars with a single canvas operation, and only the stars which
+    leave the bottom of the screen are individually moved back to the top,
+    so the cost of a frame does not depend on how many stars there are
+    """
+
+    # number of frames each layer takes to move down by one pixel
+    LAYER_PERIODS = (10, 5, 4, 3)
+
+    def __init__(self, game, image: PhotoImage, count=100) -> None:
+        """Initialise the starfield
+
+        :param game: The game which this belongs to
+        :param image: The image to use for each star
+        :type image: PhotoImage
+        :param count: The number of stars in the field
+        :rtype: None
+        """
+        self.game = game
+        self.canvas = game.canvas
+        self.image = image
+        # stars have their own generator, so the background does not change
+        # the random numbers of the game, which are kept in save snapshots
+        self.random = Random()
+
+        self.xs = array("h")
+        # y positions relative to the scroll offset of each star's layer,
+        # which is kept below the wrap height so they fit in 16 bits
+        self.ys = array("h")
+        self.layers = array("b")
+        self.items = []
+
+        self.offsets = [0] * len(Starfield.LAYER_PERIODS)
+        # alpha when the stars were last scrolled
+        self.last_alpha = game.alpha
+        # star indices of each layer, ordered from the bottom of the screen
+        self.columns = [deque() for _ in Starfield.LAYER_PERIODS]
+
+        self.populate(count)
+
+    def populate(self, count):
+        """Scatter stars across the whole screen
+
+        :param count: The number of stars to add
+        """
+        stars = []
+        for _ in range(count):
+            layer = self.random.randrange(len(Starfield.LAYER_PERIODS))
+            x = self.random.randint(0, self.game.w)
+            y = self.random.randint(0, self.game.h)
+
+            self.xs.append(x)
+            self.ys.append(y - self.offsets[layer])
+            self.layers.append(layer)
+            self.items.append(self.canvas.create_image(
+                x * Config.SCALE, y * Config.SCALE, anchor=NW,
+                image=self.image, tags=("star", f"star{layer}")))
+            stars.append((y, len(self.items) - 1))
+
+        for _, star in sorted(stars, reverse=True):
+            self.columns[self.layers[star]].append(star)
+
+        self.canvas.tag_lower("star")
+
+    def tick(self):
+        """Scroll every layer by the number of times it was due to move
+        since the last frame
+        """
+        alpha = self.game.alpha
+        # a layer never needs to move further than it takes to wrap
+        height = self.game.h + 1
+        if alpha < self.last_alpha:
+            # the game went back in time, such as when a save was restored
+            self.last_alpha = alpha - 1
+
+        for layer, period in enumerate(Starfield.LAYER_PERIODS):
+            moves = min(alpha // period - self.last_alpha // period, height)
+            if moves > 0:
+                self.offsets[layer] += moves
+                self.canvas.move(f"star{layer}", 0, moves * Config.SCALE)
+                self.wrap_layer(layer)
+        self.last_alpha = alpha
+
+    def wrap_layer(self, layer):
+        """Move the stars that left the bottom of a layer back to the top
+
+        :param layer: The index of the layer
+        """
+        column = self.columns[layer]
+        offset = self.offsets[layer]
+        while column and self.ys[column[0]] + offset > self.game.h:
+            star = column.popleft()
+            x = self.random.randint(0, self.game.w)
+            self.xs[star] = x
+            self.ys[star] = -1 - offset
+            self.canvas.coords(self.items[star],
+                               x * Config.SCALE, -Config.SCALE)
+            column.append(star)
+
+        # take whole wraps off the offset, so the positions stay small
+        height = self.game.h + 1
+        if offset >= height:
+            shift = offset - offset % height
+            self.offsets[layer] = offset - shift
+            for star in column:
+                self.ys[star] += shift
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+from autosave import AutosaveRing
+from snapshot import GameSnapshot, SnapshotWriter
+
+
+def make_lazer(x, y):
+    """Return an object with the fields of a lazer that are saved"""
+    return SimpleNamespace(x=x, y=y, velocity=-4, color="red",
+                           destroyed=False)
+
+
+def make_sections(player_lazers, enemy_lazers):
+    """Return the sections of a snapshot holding two lists of lazers"""
+    writer = SnapshotWriter()
+    writer.pack(GameSnapshot.RANDOM_STATE, *range(625))
+    writer.start_section()
+    GameSnapshot.write_lazers(writer, player_lazers)
+    writer.start_section()
+    GameSnapshot.write_lazers(writer, enemy_lazers)
+    return writer.get_sections()
+
+
+def test_one_lazer_makes_a_small_delta():
+    player_lazers = [make_lazer(10, y) for y in range(0, 200, 20)]
+    enemy_lazers = [make_lazer(x, 50) for x in range(0, 400, 10)]
+    keyframe = make_sections(player_lazers, enemy_lazers)
+    sections = make_sections(player_lazers + [make_lazer(12, 300)],
+                             enemy_lazers)
+
+    delta = AutosaveRing.make_delta(keyframe, sections)
+    assert AutosaveRing.apply_delta(keyframe, delta) == sections
+
+    # only the count and the new lazer differ, the enemy lazers after
+    # them are not moved
+    snapshot = b"".join(sections)
+    assert len(delta) < 200
+    assert len(delta) * 10 < len(snapshot)
+
+
+def test_sections_round_trip():
+    sections = make_sections([make_lazer(1, 2)], [])
+    data = AutosaveRing.join_sections(sections)
+    assert AutosaveRing.split_sections(data) == sections
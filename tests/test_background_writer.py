@@ -0,0 +1,34 @@
+from io import StringIO
+from threading import Thread
+
+import background_writer
+from background_writer import BackgroundWriter
+
+
+def flush_within(writer, timeout=5):
+    """Return whether the writer's flush returns before the timeout"""
+    thread = Thread(target=writer.flush, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def test_failing_write_does_not_hang_flush(tmp_path, monkeypatch):
+    errors = StringIO()
+    monkeypatch.setattr(background_writer, "stderr", errors)
+    writer = BackgroundWriter()
+
+    def fail(items):
+        raise ValueError("bad record")
+
+    writer.append("broken", 1, fail)
+    assert flush_within(writer)
+    assert not writer.is_pending("broken")
+    assert "Failed to write broken: bad record" in errors.getvalue()
+
+    # the thread carries on writing after the failure
+    filename = tmp_path / "save"
+    writer.replace_file(str(filename), b"data")
+    assert flush_within(writer)
+    assert filename.read_bytes() == b"data"
+    writer.close()
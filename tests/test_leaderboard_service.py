@@ -0,0 +1,121 @@
+import time
+from io import StringIO
+from threading import Thread
+
+import pytest
+
+import leaderboard_service
+from leaderboard_service import LeaderboardClient, LeaderboardServer
+
+
+def start_server(tmp_path, name="leaderboard"):
+    """Start a leaderboard service on a unix socket in a temporary folder"""
+    server = LeaderboardServer(str(tmp_path / "socket"), str(tmp_path / name))
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_for(predicate, timeout=5):
+    """Return whether a predicate became true before the timeout"""
+    end = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def errors(monkeypatch):
+    """Collect what the client prints to stderr"""
+    output = StringIO()
+    monkeypatch.setattr(leaderboard_service, "stderr", output)
+    return output
+
+
+def test_entries_are_sent_and_read_back(tmp_path):
+    server = start_server(tmp_path)
+    client = LeaderboardClient(str(tmp_path / "socket"))
+
+    client.add_entry("aaa", 300)
+    client.add_entry("bbb", 100)
+    client.add_entry("ccc", 200)
+    # batches are only sent once they are full or flushed
+    assert len(server.store) == 0
+    assert client.rank(250) == 2
+
+    client.flush()
+    assert len(server.store) == 3
+    response = server.handle_request({"op": "rank", "score": 250})
+    assert response["rank"] == 2
+
+    # reading marks the cache stale, and a flush waits for the refresh
+    client.get_entries(0, 3)
+    client.flush()
+    assert client.get_entries(0, 3) == [("aaa", 300), ("ccc", 200),
+                                        ("bbb", 100)]
+    assert client.count() == 3
+
+    client.close()
+    server.shutdown()
+
+
+def test_unchanged_only_for_the_same_epoch(tmp_path):
+    server = start_server(tmp_path, "first")
+    server.handle_request({"op": "add", "entries": [["aaa", 10]]})
+    request = {"op": "window", "start": 0, "count": 5,
+               "epoch": server.epoch, "version": server.version}
+    assert server.handle_request(request)["unchanged"]
+
+    client = LeaderboardClient(str(tmp_path / "socket"))
+    client.get_entries(0, 5)
+    client.flush()
+    assert client.get_entries(0, 5) == [("aaa", 10)]
+    server.shutdown()
+    # the connections of the old process go with it
+    for connection in client.idle:
+        LeaderboardClient.close_connection(connection)
+    client.idle = []
+
+    # a restarted service counts its versions from the start again
+    server = start_server(tmp_path, "second")
+    server.handle_request({"op": "add", "entries": [["bbb", 20]]})
+    assert server.version == client.version
+    assert "unchanged" not in server.handle_request(
+        dict(request, epoch=client.epoch))
+
+    client.get_entries(0, 5)
+    client.flush()
+    assert client.get_entries(0, 5) == [("bbb", 20)]
+    assert client.poll()
+
+    client.close()
+    server.shutdown()
+
+
+def test_unavailable_service_is_retried_after_a_wait(tmp_path, monkeypatch,
+                                                     errors):
+    monkeypatch.setattr(LeaderboardClient, "RETRY_TIME", 0.2)
+    attempts = []
+    connect = LeaderboardClient.connect
+    monkeypatch.setattr(LeaderboardClient, "connect",
+                        lambda self: attempts.append(1) or connect(self))
+
+    client = LeaderboardClient(str(tmp_path / "socket"))
+    # more than a batch, so the entries are due to be sent straight away
+    for score in range(LeaderboardClient.BATCH_SIZE + 4):
+        client.add_entry("aaa", score)
+
+    end = time.monotonic() + 0.5
+    while time.monotonic() < end:
+        client.get_entries(0, 10)
+        time.sleep(0.01)
+    assert 1 <= len(attempts) <= 4
+    assert errors.getvalue().count("unavailable") == 1
+
+    server = start_server(tmp_path)
+    assert wait_for(lambda: len(server.store) == 20)
+    assert "available again" in errors.getvalue()
+
+    client.close()
+    server.shutdown()
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+from config import Config
+from starfield import Starfield
+
+
+class FakeCanvas:
+    """Canvas which records where each star is drawn"""
+
+    def __init__(self):
+        self.items = {}
+        # distance each tag has been moved down
+        self.moved = {}
+
+    def create_image(self, x, y, tags=(), **_):
+        item = len(self.items) + 1
+        self.items[item] = [y, tags[-1]]
+        return item
+
+    def tag_lower(self, _):
+        pass
+
+    def move(self, tag, _, dy):
+        self.moved[tag] = self.moved.get(tag, 0) + dy
+
+    def coords(self, item, _, y):
+        self.items[item][0] = y - self.moved.get(self.items[item][1], 0)
+
+    def get_y(self, item):
+        y, tag = self.items[item]
+        return (y + self.moved.get(tag, 0)) // Config.SCALE
+
+
+def test_layers_scroll_past_16_bit_offsets():
+    game = SimpleNamespace(canvas=FakeCanvas(), w=200, h=300, alpha=0)
+    starfield = Starfield(game, image=None, count=50)
+
+    fastest = min(Starfield.LAYER_PERIODS)
+    for alpha in range(1, fastest * (2**15 + 100)):
+        game.alpha = alpha
+        starfield.tick()
+
+    for star, item in enumerate(starfield.items):
+        layer = starfield.layers[star]
+        assert 0 <= starfield.offsets[layer] <= game.h
+        y = starfield.ys[star] + starfield.offsets[layer]
+        assert -1 <= y <= game.h
+        assert game.canvas.get_y(item) == y
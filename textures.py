@@ -372,11 +372,12 @@ class TextureFactory:
         self.textures = {}
         self.scale = scale
 
-    def load_texture(self, namespace, texture_matrix):
+    def load_texture(self, namespace, texture_matrix, cache=True):
         """Load and upscale a texture
 
         :param namespace: namespace to save this texture to
         :param texture_matrix: A matrix of hex colours that represents the texture
+        :param cache: Whether to keep the texture for later use
         """
         if namespace not in self.textures:
             height = len(texture_matrix) * self.scale
@@ -391,7 +392,8 @@ class TextureFactory:
                         photo_image.put(
                             pixel_string, (matrix_x*self.scale, matrix_y*self.scale))
 
-            self.textures[namespace] = photo_image
+            if cache:
+                self.textures[namespace] = photo_image
             return photo_image
         return self.get_image(namespace)
 
@@ -0,0 +1,118 @@
+class Timer:
+    """A callback scheduled on a timer wheel"""
+
+    def __init__(self, due, callback, interval=None) -> None:
+        """Initialise the timer
+
+        :param due: The tick at which the callback should be called
+        :param callback: The function to call
+        :param interval: Number of ticks between repeats, or None to only
+                         call the callback once
+        :rtype: None
+        """
+        self.due = due
+        self.callback = callback
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        """Stop the callback from being called"""
+        self.cancelled = True
+
+
+class TimerWheel:
+    """Hierarchical timer wheel which calls callbacks at a given tick
+
+    Timers that are due soon are kept in the slots of the first level, one
+    slot for each tick.  Timers further away are kept in coarser levels and
+    cascaded down as their time approaches, so each tick only touches the
+    timers that are due rather than every timer that exists
+    """
+
+    # each level has 2**BITS slots
+    BITS = 6
+    LEVELS = 4
+
+    def __init__(self, tick=0) -> None:
+        """Initialise the timer wheel
+
+        :param tick: The current tick
+        :rtype: None
+        """
+        self.tick = tick
+        self.mask = (1 << TimerWheel.BITS) - 1
+        self.levels = [
+            [[] for _ in range(1 << TimerWheel.BITS)]
+            for _ in range(TimerWheel.LEVELS)
+        ]
+        # timers too far away to fit in any level
+        self.overflow = []
+
+    def schedule(self, delay, callback, repeat=False):
+        """Call a function after a number of ticks
+
+        :param delay: Number of ticks to wait, at least 1
+        :param callback: The function to call
+        :param repeat: Whether to keep calling the function every delay ticks
+        :returns: A timer which can be cancelled
+        :rtype: Timer
+        """
+        delay = max(1, int(delay))
+        timer = Timer(self.tick + delay, callback,
+                      delay if repeat else None)
+        self.insert(timer)
+        return timer
+
+    def insert(self, timer: Timer):
+        """Place a timer into the slot for its due tick
+
+        :param timer: The timer to insert
+        :type timer: Timer
+        """
+        delta = timer.due - self.tick
+        for level, slots in enumerate(self.levels):
+            shift = TimerWheel.BITS * level
+            if delta < 1 << (shift + TimerWheel.BITS):
+                slots[(timer.due >> shift) & self.mask].append(timer)
+                return
+        self.overflow.append(timer)
+
+    def cascade(self):
+        """Move timers from coarser levels down as their time approaches"""
+        for level in range(1, TimerWheel.LEVELS):
+            shift = TimerWheel.BITS * level
+            if self.tick & ((1 << shift) - 1):
+                return
+
+            slots = self.levels[level]
+            slot = (self.tick >> shift) & self.mask
+            timers, slots[slot] = slots[slot], []
+            for timer in timers:
+                if not timer.cancelled:
+                    self.insert(timer)
+
+        timers, self.overflow = self.overflow, []
+        for timer in timers:
+            if not timer.cancelled:
+                self.insert(timer)
+
+    def advance(self, tick):
+        """Move the wheel forward, calling every callback that becomes due
+
+        :param tick: The tick to advance to
+        """
+        slots = self.levels[0]
+        while self.tick < tick:
+            self.tick += 1
+            self.cascade()
+
+            slot = self.tick & self.mask
+            if slots[slot]:
+                timers, slots[slot] = slots[slot], []
+                for timer in timers:
+                    if timer.cancelled:
+                        continue
+                    timer.callback()
+                    if timer.interval is not None and not timer.cancelled:
+                        timer.due += timer.interval
+                        self.insert(timer)
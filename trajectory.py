@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+
+class TrajectoryCache:
+    """Least recently used cache of precomputed trajectory tables
+
+    A trajectory table holds one full period of positions along a path, so
+    that anything following that path only needs to index the table by
+    alpha % period instead of evaluating the path every frame
+    """
+
+    def __init__(self, size=64) -> None:
+        """Initialise the cache
+
+        :param size: The maximum number of tables to keep
+        :rtype: None
+        """
+        self.size = size
+        self.tables = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_table(self, path, params, period):
+        """Return the table for a path, building it if it is not cached
+
+        :param path: function which takes the fraction of the period that has
+                     elapsed followed by the params and returns a position
+        :param params: A tuple of parameters to pass to the path
+        :param period: The number of frames in one period of the path
+        """
+        key = (path, params, period)
+        table = self.tables.get(key)
+
+        if table is None:
+            self.misses += 1
+            table = [path(i / period, *params) for i in range(period)]
+            self.tables[key] = table
+            if len(self.tables) > self.size:
+                self.tables.popitem(last=False)
+        else:
+            self.hits += 1
+            self.tables.move_to_end(key)
+
+        return table
+
+    def hit_rate(self):
+        """Return the fraction of lookups that were found in the cache"""
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0
+        return self.hits / lookups
+
+    def report(self):
+        """Return a summary of how well the cache is performing"""
+        return (f"trajectory cache: {len(self.tables)}/{self.size} tables, "
+                f"{self.hits} hits, {self.misses} misses, "
+                f"{self.hit_rate():.1%} hit rate")
+
+    def clear(self):
+        """Remove all cached tables"""
+        self.tables.clear()